@@ -0,0 +1,176 @@
+"""
+Generate a synthetic corpus of invention disclosure PDFs for benchmarking.
+
+The real disclosures are confidential, so this writes look-alike forms into
+a raw/ tree (raw/XX-T-XXX/InventionDisclosureXXX.pdf plus supplementary
+papers). Page counts, where Section III falls, markers split across a page
+break, OCR-style spacing noise and forms without a Section III are all
+configurable. The PDFs are written directly, without any PDF library.
+"""
+import os
+import random
+import argparse
+
+WORDS = (
+    "sensor array signal device method system layer substrate polymer circuit data model network "
+    "sample protein cell laser optical energy battery electrode membrane catalyst frequency "
+    "measurement analysis process material structure surface particle temperature pressure control "
+    "invention prior art embodiment configured comprising wherein apparatus module interface"
+).split()
+
+SECTION_III = "III. ADDITIONAL INFORMATION & SUPPORTING DOCUMENTS"
+SIGNATURE_LINES = [
+    "IV. CONTRIBUTOR SIGNATURES",
+    "At least one contributor must sign this form confirming the accuracy of the information provided.",
+    "For additional Contributors, simply copy the table below and paste at the end of the document.",
+    "Name: ____________________   Signature: ____________________   Date: __________",
+]
+LINES_PER_PAGE = 50
+
+def escape_pdf_text(text):
+    """Escape a string for use inside a PDF literal string."""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, pages, title=None):
+    """Write a minimal PDF with one Helvetica text line per entry of each page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font_id = 3 + 2 * len(pages)
+    for i, lines in enumerate(pages):
+        ops = ["BT /F1 9 Tf 14 TL 40 800 Td"]
+        ops.extend(f"({escape_pdf_text(line)}) Tj T*" for line in lines)
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    info_id = None
+    if title:
+        objects.append(f"<< /Title ({escape_pdf_text(title)}) >>".encode("latin-1", "replace"))
+        info_id = len(objects)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    info = b" /Info %d 0 R" % info_id if info_id else b""
+    out += b"trailer\n<< /Size %d /Root 1 0 R%s >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, info, xref)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def add_spacing_noise(line, rng, rate):
+    """Imitate OCR-style spacing errors: spaces inside words and words run together."""
+    if rate <= 0:
+        return line
+    chars = []
+    for ch in line:
+        roll = rng.random()
+        if ch == " " and roll < rate:
+            continue
+        chars.append(ch)
+        if ch != " " and roll < rate:
+            chars.append(" ")
+    return "".join(chars)
+
+def paragraph_lines(rng, count):
+    """Random filler lines of prose."""
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))).capitalize() + "."
+            for _ in range(count)]
+
+def paginate(lines):
+    """Split a list of lines into pages of LINES_PER_PAGE lines."""
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+def disclosure_pages(rng, pages, marker_fraction=0.5, split_marker=False, missing_marker=False, noise=0.0):
+    """
+    Build the pages of one synthetic disclosure form.
+
+    Section III starts at about marker_fraction of the document; the pages
+    after it hold the supporting documents and the contributor signature
+    table, which is always on the last page.
+    """
+    pages = max(pages, 2)
+    marker_page = min(max(1, round(pages * marker_fraction)), pages - 1)
+    body = [["TECHNOLOGY DISCLOSURE FORM", "I. CONTRIBUTORS"] + paragraph_lines(rng, LINES_PER_PAGE - 2)]
+    body += [paragraph_lines(rng, LINES_PER_PAGE) for _ in range(marker_page - 1)]
+    body[min(1, len(body) - 1)].insert(0, "II. DESCRIPTION OF THE INVENTION")
+    tail = [paragraph_lines(rng, LINES_PER_PAGE) for _ in range(pages - marker_page)]
+    tail[-1] = tail[-1][:LINES_PER_PAGE - len(SIGNATURE_LINES)] + SIGNATURE_LINES
+
+    if not missing_marker:
+        if split_marker:
+            head, rest = SECTION_III.split(" & ")
+            body[-1] = body[-1][:LINES_PER_PAGE - 1] + [head + " &"]
+            tail[0].insert(0, rest)
+        else:
+            tail[0].insert(0, SECTION_III)
+
+    return [[add_spacing_noise(line, rng, noise) for line in page] for page in body + tail]
+
+def generate_corpus(raw_dir, disclosures=50, min_pages=4, max_pages=30, supplementary=1, supplementary_pages=12,
+                    split_rate=0.1, missing_rate=0.05, noise=0.0, seed=0, renamed_rate=0.0):
+    """
+    Write `disclosures` disclosure folders into raw_dir.
+
+    A renamed_rate fraction of the forms get a filename that does not say
+    what they are, so only their content identifies them.
+
+    Returns a list of (path, description) tuples for the generated disclosure forms.
+    """
+    rng = random.Random(seed)
+    generated = []
+    for n in range(disclosures):
+        folder = os.path.join(raw_dir, f"{20 + n // 1000:02d}-T-{n % 1000:03d}")
+        pages = rng.randint(min_pages, max_pages)
+        split_marker = rng.random() < split_rate
+        missing_marker = rng.random() < missing_rate
+        form = disclosure_pages(rng, pages, rng.uniform(0.3, 0.7), split_marker, missing_marker, noise)
+        # Only drawn when asked for, so corpora generated without renamed forms stay the same
+        renamed = renamed_rate > 0 and rng.random() < renamed_rate
+        path = os.path.join(folder, f"form-{n:03d}.pdf" if renamed else f"InventionDisclosure{n:03d}.pdf")
+        write_pdf(path, form, title="Invention Disclosure Form")
+        generated.append((path, {"pages": len(form), "split_marker": split_marker,
+                                 "missing_marker": missing_marker, "renamed": renamed}))
+
+        for k in range(supplementary):
+            paper = paginate(["SUPPORTING PAPER"] + paragraph_lines(rng, supplementary_pages * LINES_PER_PAGE))
+            write_pdf(os.path.join(folder, f"paper{k}.pdf"), paper)
+    return generated
+
+def parse_page_range(value):
+    """argparse type for a page range such as 4-30."""
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic invention disclosure corpus")
+    parser.add_argument("--raw-dir", default="bench/raw", help="Directory to write the raw PDF tree to")
+    parser.add_argument("--disclosures", type=int, default=50, help="Number of disclosure folders")
+    parser.add_argument("--pages", type=parse_page_range, default=(4, 30), help="Page count range of the forms, e.g. 4-30")
+    parser.add_argument("--supplementary", type=int, default=1, help="Supplementary papers per folder")
+    parser.add_argument("--supplementary-pages", type=int, default=12, help="Pages per supplementary paper")
+    parser.add_argument("--split-rate", type=float, default=0.1,
+                       help="Fraction of forms whose Section III marker is split across a page break")
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="Fraction of forms without a Section III")
+    parser.add_argument("--noise", type=float, default=0.0, help="Per-character rate of OCR-style spacing errors")
+    parser.add_argument("--renamed-rate", type=float, default=0.0,
+                       help="Fraction of forms saved under a filename that does not identify them")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    generated = generate_corpus(args.raw_dir, args.disclosures, args.pages[0], args.pages[1], args.supplementary,
+                                args.supplementary_pages, args.split_rate, args.missing_rate, args.noise, args.seed,
+                                args.renamed_rate)
+    print(f"Wrote {len(generated)} disclosure forms to {args.raw_dir}")
@@ -0,0 +1,177 @@
+"""
+Benchmark the pipeline stages on a synthetic disclosure corpus.
+
+Each script is run end to end as a subprocess to measure stage throughput.
+The per-file work of each stage (and of every boundary strategy on its own)
+is then timed in-process to report p50/p95/p99 latency.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import PyPDF2
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from make_corpus import generate_corpus, parse_page_range
+from disclosure_cleanup import selection
+from disclosure_cleanup.desensitization import process_pdf
+from disclosure_cleanup.extraction import STRATEGIES, extract_document, extract_page_texts, find_section_boundary
+
+EXTRACT_SCRIPTS = ["01-extract-content.py", "01-extract-content-revised.py", "01-extract-content-revised-2.py"]
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+def summarize(name, latencies, wall=None, files=None):
+    """Throughput and latency percentiles (in milliseconds) for one benchmark."""
+    files = len(latencies) if files is None else files
+    wall = sum(latencies) if wall is None else wall
+    return {
+        "name": name,
+        "files": files,
+        "seconds": round(wall, 3),
+        "files_per_sec": round(files / wall, 2) if wall > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+def time_call(func, *args, **kwargs):
+    """Run func and return (seconds, result)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def run_script(script, args, files):
+    """Run one pipeline script as a subprocess and time it."""
+    command = [sys.executable, str(REPO_DIR / script)] + [str(a) for a in args]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        print(f"Error running {script}: {completed.stderr.strip().splitlines()[-1:]}")
+    return summarize(f"stage {script}", [], wall, files)
+
+def benchmark_stages(raw_dir, work_dir, workers):
+    """Time each pipeline script end to end."""
+    disclosure_dir = work_dir / "invention_disclosure"
+    supplementary_dir = work_dir / "supplementary"
+    raw_count = sum(1 for _ in Path(raw_dir).rglob("*.pdf"))
+    results = [run_script("00-select-disclosure.py", ["--raw-dir", raw_dir, "--disclosure-dir", disclosure_dir,
+                                                      "--supplementary-dir", supplementary_dir], raw_count)]
+
+    disclosure_count = sum(1 for _ in disclosure_dir.rglob("*.pdf"))
+    for script in EXTRACT_SCRIPTS:
+        out_dir = work_dir / Path(script).stem
+        results.append(run_script(script, ["--disclosure-dir", disclosure_dir, "--disclosure-text-dir", out_dir / "text",
+                                           "--output-dir", out_dir, "--workers", workers], disclosure_count))
+    results.append(run_script("02-desensitize-disclosure.py", ["--disclosure-dir", disclosure_dir,
+                                                               "--desensitized-dir", work_dir / "desensitized"],
+                              disclosure_count))
+    results.append(run_script("run-pipeline.py", ["--raw-dir", raw_dir, "--disclosure-dir", work_dir / "p" / "disclosure",
+                                                  "--supplementary-dir", work_dir / "p" / "supplementary",
+                                                  "--disclosure-text-dir", work_dir / "p" / "text",
+                                                  "--desensitized-dir", work_dir / "p" / "desensitized",
+                                                  "--output-dir", work_dir / "p", "--workers", workers], raw_count))
+    return results
+
+def benchmark_files(raw_dir, work_dir, strategies):
+    """Time the per-file work of each stage and each boundary strategy in-process."""
+    raw_files = sorted(Path(raw_dir).rglob("*.pdf"))
+    select_dir = work_dir / "select"
+    latencies = {}
+    disclosures = []
+    for pdf_path in raw_files:
+        def select():
+            is_invention = selection.classify_pdf(pdf_path).is_invention
+            dest = select_dir / ("disclosure" if is_invention else "supplementary") / pdf_path.name
+            os.makedirs(dest.parent, exist_ok=True)
+            selection.place_file(pdf_path, dest)
+            return is_invention
+        seconds, is_invention = time_call(select)
+        latencies.setdefault("select", []).append(seconds)
+        if is_invention:
+            disclosures.append(pdf_path)
+
+    for pdf_path in disclosures:
+        seconds, _ = time_call(extract_document, pdf_path)
+        latencies.setdefault("extract (default chain)", []).append(seconds)
+
+        with open(pdf_path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            seconds, page_texts = time_call(extract_page_texts, reader)
+        latencies.setdefault("page text extraction", []).append(seconds)
+        for name in strategies:
+            seconds, _ = time_call(find_section_boundary, page_texts, [name])
+            latencies.setdefault(f"strategy {name}", []).append(seconds)
+
+        seconds, _ = time_call(process_pdf, pdf_path, work_dir / "desensitize" / pdf_path.name)
+        latencies.setdefault("desensitize", []).append(seconds)
+
+    return [summarize(name, values) for name, values in latencies.items()]
+
+def print_table(results):
+    """Print benchmark results as an aligned table."""
+    columns = ["name", "files", "seconds", "files_per_sec", "p50_ms", "p95_ms", "p99_ms"]
+    rows = [[("-" if r[c] is None else str(r[c])) for c in columns] for r in results]
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(w) for value, w in zip(row, widths)))
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the disclosure pipeline on a synthetic corpus")
+    parser.add_argument("--raw-dir", default=None,
+                       help="Existing raw PDF tree to benchmark (default: generate a synthetic corpus)")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory for outputs (default: a temporary directory)")
+    parser.add_argument("--disclosures", type=int, default=50, help="Number of synthetic disclosure folders")
+    parser.add_argument("--pages", type=parse_page_range, default=(4, 30), help="Page count range of the forms, e.g. 4-30")
+    parser.add_argument("--split-rate", type=float, default=0.1,
+                       help="Fraction of forms whose Section III marker is split across a page break")
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="Fraction of forms without a Section III")
+    parser.add_argument("--renamed-rate", type=float, default=0.0,
+                       help="Fraction of forms saved under a filename that does not identify them")
+    parser.add_argument("--noise", type=float, default=0.0, help="Per-character rate of OCR-style spacing errors")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic corpus")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the extraction stages")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES),
+                       help="Comma-separated boundary strategies to time individually")
+    parser.add_argument("--skip-stages", action="store_true", help="Only run the in-process per-file benchmarks")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="disclosure-bench-"))
+    raw_dir = args.raw_dir
+    if raw_dir is None:
+        raw_dir = work_dir / "raw"
+        generate_corpus(raw_dir, args.disclosures, args.pages[0], args.pages[1], split_rate=args.split_rate,
+                        missing_rate=args.missing_rate, noise=args.noise, seed=args.seed, renamed_rate=args.renamed_rate)
+
+    try:
+        results = [] if args.skip_stages else benchmark_stages(raw_dir, work_dir, args.workers)
+        results += benchmark_files(raw_dir, work_dir, [s for s in args.strategies.split(",") if s])
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,16 @@
+"""
+Shared helpers for the invention disclosure cleanup scripts.
+
+The library API (classify, extract_until_section, desensitize) is exported
+here; see disclosure_cleanup.api. It is imported on first use so the
+scripts that only need a helper module do not pay for PyPDF2.
+"""
+
+__all__ = ["classify", "extract_until_section", "desensitize"]
+
+def __getattr__(name):
+    if name in __all__:
+        from disclosure_cleanup import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,4 @@
+import sys
+from disclosure_cleanup.cli import main
+
+sys.exit(main())
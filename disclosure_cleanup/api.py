@@ -0,0 +1,98 @@
+"""
+Library interface to the pipeline stages, for embedding them in other services.
+
+Each function takes an iterable of PDF sources (paths, bytes or binary
+file-like objects) and lazily yields (source, result) pairs, where source
+is the object that was passed in. At most batch_size sources are read
+ahead of the results taken out, so a generator of sources is consumed
+only as fast as it is processed. With workers > 1 the batch in flight is
+spread over a process pool (file-like objects are read into bytes first,
+as they cannot be sent to another process) and results are yielded as
+they finish; ordered=True yields them in input order instead.
+
+    from disclosure_cleanup import extract_until_section
+
+    for source, result in extract_until_section(pdf_bytes_stream, workers=4):
+        if result.status == "ok":
+            ingest(result.text)
+"""
+import functools
+from disclosure_cleanup.desensitization import DesensitizeResult, desensitize_bytes
+from disclosure_cleanup.extraction import ExtractionResult, extract_document
+from disclosure_cleanup.page_cache import DEFAULT_CACHE_SIZE_MB, open_cache
+from disclosure_cleanup.parallel import imap_ordered, imap_unordered
+from disclosure_cleanup.selection import Classification, classify_pdf
+from disclosure_cleanup.sources import materialize, source_name
+
+DEFAULT_BATCH_SIZE = 32
+
+class Job:
+    """One source on its way to a worker; prints as the source's name so error messages stay short."""
+
+    def __init__(self, index, source, payload):
+        self.index = index
+        self.name = source_name(source) or f"<input {index}>"
+        self.payload = payload
+
+    def __str__(self):
+        return self.name
+
+def run_job(func, job):
+    return func(job.payload)
+
+def run_batched(func, sources, workers=1, batch_size=DEFAULT_BATCH_SIZE, ordered=False, failed=None):
+    """Apply func to each source and yield (source, result) pairs (see the module docstring)."""
+    originals = {}
+
+    def jobs():
+        for index, source in enumerate(sources):
+            originals[index] = source
+            yield Job(index, source, materialize(source) if workers > 1 else source)
+
+    imap = imap_ordered if ordered else imap_unordered
+    for job, result in imap(functools.partial(run_job, func), jobs(), workers, failed, max(batch_size, workers)):
+        yield originals.pop(job.index), result
+
+def classify_source(source, mode="content", page_timeout=None, cache_path=None,
+                    cache_size_mb=DEFAULT_CACHE_SIZE_MB):
+    return classify_pdf(source, mode, open_cache(cache_path, cache_size_mb), page_timeout)
+
+def classify(sources, mode="content", page_timeout=None, cache_path=None, cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+             workers=1, batch_size=DEFAULT_BATCH_SIZE, ordered=False):
+    """
+    Yield (source, Classification) pairs telling which PDFs are invention disclosures.
+
+    The options are those of the select stage (see classify_pdf); only the
+    first page of each PDF is read.
+    """
+    classify_one = functools.partial(classify_source, mode=mode, page_timeout=page_timeout, cache_path=cache_path,
+                                     cache_size_mb=cache_size_mb)
+    failed = Classification(False, "error")
+    return run_batched(classify_one, sources, workers, batch_size, ordered, failed)
+
+def extract_until_section(sources, strategies=None, threshold=0.7, normalizer="compact", streaming=False,
+                          time_budget=None, page_timeout=None, cache_path=None,
+                          cache_size_mb=DEFAULT_CACHE_SIZE_MB, workers=1, batch_size=DEFAULT_BATCH_SIZE,
+                          ordered=False):
+    """
+    Yield (source, ExtractionResult) pairs with the text of each PDF up to the Section III marker.
+
+    The options are those of the extract stage (see extract_document).
+    """
+    extract = functools.partial(extract_document, streaming=streaming, strategies=strategies, threshold=threshold,
+                                normalizer=normalizer, time_budget=time_budget, page_timeout=page_timeout,
+                                cache_path=cache_path, cache_size_mb=cache_size_mb)
+    failed = ExtractionResult("", None, "error", "worker failed")
+    return run_batched(extract, sources, workers, batch_size, ordered, failed)
+
+def desensitize(sources, time_budget=None, page_timeout=None, eager_pages=False, cache_path=None,
+                cache_size_mb=DEFAULT_CACHE_SIZE_MB, workers=1, batch_size=DEFAULT_BATCH_SIZE, ordered=False):
+    """
+    Yield (source, DesensitizeResult) pairs; result.pdf holds the bytes of the desensitized PDF.
+
+    The options are those of the desensitize stage (see desensitize_document).
+    """
+    run = functools.partial(desensitize_bytes, time_budget=time_budget, page_timeout=page_timeout,
+                            eager_pages=eager_pages, cache_path=cache_path, cache_size_mb=cache_size_mb)
+    failed = DesensitizeResult(None, None, None, None, "error", "worker failed", None)
+    return run_batched(run, sources, workers, batch_size, ordered, failed)
@@ -0,0 +1,65 @@
+"""
+Atomic output writes: each output is written under a temporary name next to it and renamed into place.
+
+A run that is killed halfway (by the OOM killer, preemption or Ctrl-C)
+then leaves every output either as it was or complete, never half-written,
+so a resumed run can trust the outputs it finds. Renaming also replaces a
+hard link instead of writing through it, so an output shared with a
+duplicate is never changed in place.
+"""
+import os
+import socket
+import shutil
+from contextlib import contextmanager
+
+HOST = socket.gethostname()
+
+def temporary_path(path, suffix=".tmp"):
+    """A hidden name next to path, unique to this process (and host, as the data directory may be shared)."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{HOST}-{os.getpid()}{suffix}")
+
+def discard(tmp_path):
+    if os.path.isdir(tmp_path) and not os.path.islink(tmp_path):
+        shutil.rmtree(tmp_path)
+    elif os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def remove_stale_temporaries(path, suffix=".tmp"):
+    """Delete the temporary files of path left behind by processes on this host that were killed while writing it."""
+    directory, name = os.path.split(path)
+    prefix = f".{name}.{HOST}-"
+    for entry in os.scandir(directory or "."):
+        pid = entry.name[len(prefix):-len(suffix)]
+        if entry.name.startswith(prefix) and entry.name.endswith(suffix) and pid.isdigit() \
+                and not process_exists(int(pid)):
+            discard(entry.path)
+
+@contextmanager
+def atomic_write(path, mode="w", encoding=None):
+    """Open a temporary file for writing that replaces path once the block completes without an error."""
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, mode, encoding=encoding) as file:
+            yield file
+        os.replace(tmp_path, path)
+    finally:
+        discard(tmp_path)
+
+def atomic_copy(src, dest):
+    """Copy src to dest with its metadata, like shutil.copy2, through a temporary file."""
+    tmp_path = temporary_path(dest)
+    try:
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dest)
+    finally:
+        discard(tmp_path)
@@ -0,0 +1,85 @@
+import time
+import signal
+import threading
+from contextlib import contextmanager
+
+class TimeBudgetExceeded(TimeoutError):
+    """Raised when a document runs over its time budget."""
+
+class PageTimeout(TimeoutError):
+    """Raised when extracting a single page takes longer than the page timeout."""
+
+class Deadline:
+    """A point in time by which a document must be finished; `None` seconds means no limit."""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        """Seconds left before the deadline, or None if there is no limit."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """Check whether the deadline has passed."""
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, what):
+        """Raise TimeBudgetExceeded if the deadline has passed."""
+        if self.expired():
+            raise TimeBudgetExceeded(f"time budget of {self.seconds:g}s exceeded {what}")
+
+def alarms_available():
+    """SIGALRM timers only work on POSIX and in the main thread."""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+@contextmanager
+def time_limit(seconds, exc_type=PageTimeout, message="timed out"):
+    """
+    Interrupt the enclosed block with exc_type once `seconds` have passed.
+
+    Uses SIGALRM, so it also interrupts PyPDF2 while it is stuck inside a
+    broken content stream. Where alarms are not available the block runs
+    without a limit.
+    """
+    if seconds is None or not alarms_available():
+        yield
+        return
+    if seconds <= 0:
+        raise exc_type(message)
+
+    def handler(signum, frame):
+        raise exc_type(message)
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def page_limit(page_timeout, deadline, page_number):
+    """
+    Time limit for extracting one page: the page timeout, capped by what is left of the document budget.
+
+    Raises PageTimeout if the page timeout is the one hit and TimeBudgetExceeded
+    if the document budget runs out first.
+    """
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is not None and (page_timeout is None or remaining <= page_timeout):
+        return time_limit(remaining, TimeBudgetExceeded,
+                          f"time budget of {deadline.seconds:g}s exceeded while extracting page {page_number}")
+    if page_timeout is None:
+        return time_limit(None)
+    return time_limit(page_timeout, PageTimeout, f"page {page_number} timed out after {page_timeout:g}s")
+
+def add_budget_arguments(parser):
+    """Add the per-document time budget options to an argparse parser."""
+    parser.add_argument("--time-budget", type=float, default=None,
+                       help="Seconds allowed per document before falling back to cheap strategies or giving up")
+    parser.add_argument("--page-timeout", type=float, default=None,
+                       help="Seconds allowed for extracting the text of a single page; slower pages are skipped")
+    return parser
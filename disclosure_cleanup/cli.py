@@ -0,0 +1,197 @@
+"""
+Command line interface: `python -m disclosure_cleanup <command>`.
+
+The commands are the pipeline stages (select, extract, desensitize), the
+single-pass pipeline (run), with the same options as the stage scripts and
+sharding over several machines, watch mode (watch), which runs the pipeline
+on raw folders as they land, the merge step of sharded runs and watch mode
+(merge), and a local HTTP service (serve).
+Building the parser only imports the standard library; PyPDF2, tqdm and
+pyarrow are imported by the code paths that use them, so a command that
+extracts a single PDF does not pay for the parquet writer.
+"""
+import os
+import sys
+import glob
+import signal
+import argparse
+from disclosure_cleanup.desensitization import add_desensitize_arguments, batch_process_pdfs
+from disclosure_cleanup.extraction import add_extraction_arguments, extract_document, process_pdfs
+from disclosure_cleanup.manifest import add_checkpoint_arguments
+from disclosure_cleanup.memory import memory_limits
+from disclosure_cleanup.metrics import RunReport
+from disclosure_cleanup.parts import PARTS_DIR
+from disclosure_cleanup.pipeline import add_pipeline_arguments, run_pipeline
+from disclosure_cleanup.selection import add_selection_arguments
+from disclosure_cleanup.service_options import add_service_arguments
+from disclosure_cleanup.sharding import (add_merge_arguments, add_shard_arguments, merge_parts,
+                                         run_queue_worker, run_shard)
+from disclosure_cleanup.watch import add_watch_arguments, watch_pipeline
+from disclosure_cleanup import selection
+
+def select_command(args):
+    """Classify raw PDFs into invention disclosures and supplementary documents."""
+    selection.process_pdfs(args.raw_dir, args.disclosure_dir, args.supplementary_dir, args.manifest, args.link_mode,
+                           args.report, args.prometheus_textfile, args.workers, args.classify_by, args.page_cache,
+                           args.page_cache_size, args.dedup, args.resume, args.checkpoint_interval)
+
+def extract_files(args):
+    """Print the text of each PDF given on the command line up to Section III, without writing any files."""
+    failed = 0
+    with RunReport(args.report, args.prometheus_textfile) as report:
+        for pdf_path in args.pdfs:
+            result = extract_document(pdf_path, args.streaming, args.strategies, args.threshold, args.normalizer,
+                                      args.time_budget, args.page_timeout, args.page_cache, args.page_cache_size,
+                                      memory_limits(args))
+            report.add(result.metrics)
+            if result.status != "ok":
+                print(f"{pdf_path}: {result.status}" + (f" ({result.reason})" if result.reason else ""),
+                      file=sys.stderr)
+                failed += 1
+                continue
+            sys.stdout.write(result.text + "\n")
+    return 1 if failed else 0
+
+def extract_command(args):
+    """Extract the text before Section III of every disclosure form, or of the given PDFs."""
+    # The stage scripts have no positional PDFs
+    if getattr(args, "pdfs", None):
+        return extract_files(args)
+
+    # Process PDFs, streaming the rows into the parquet file
+    row_count, sample_filenames = process_pdfs(args.disclosure_dir, args.disclosure_text_dir, args.output_dir,
+                                               args.workers, args.streaming, args.manifest, args.row_group_size,
+                                               args.strategies, args.threshold, args.normalizer, args.layout,
+                                               args.time_budget, args.page_timeout, args.report,
+                                               args.prometheus_textfile, args.page_cache, args.page_cache_size,
+                                               args.dedup, args.resume, args.checkpoint_interval, memory_limits(args))
+
+    # Print sample information
+    print(f"\nParquet rows: {row_count}")
+    if sample_filenames:
+        print("\nSample filenames:")
+        for filename in sample_filenames:
+            print(f"  - {filename}")
+
+        # Print text file output info
+        txt_files = glob.glob(os.path.join(args.disclosure_text_dir, "**/*.txt"))
+        print(f"\nCreated {len(txt_files)} text files in {args.disclosure_text_dir}")
+
+def desensitize_command(args):
+    """Remove the contributor/signature section from every disclosure form."""
+    batch_process_pdfs(args.disclosure_dir, args.desensitized_dir, args.manifest, args.time_budget,
+                       args.page_timeout, args.report, args.prometheus_textfile, args.eager_pages,
+                       args.page_cache, args.page_cache_size, args.dedup, args.resume, args.checkpoint_interval,
+                       memory_limits(args))
+
+def run_command(args):
+    """Classify, extract and desensitize every raw PDF in a single pass."""
+    if args.shard:
+        run_shard(args.shard, args.raw_dir, args.disclosure_dir, args.supplementary_dir, args.disclosure_text_dir,
+                  args.desensitized_dir, args.output_dir, args.workers, args.manifest, args.link_mode,
+                  args.row_group_size, args.strategies, args.time_budget, args.page_timeout, args.report,
+                  args.prometheus_textfile, args.page_cache, args.page_cache_size, args.classify_by, args.dedup,
+                  args.resume, args.checkpoint_interval, memory_limits(args))
+        return
+    if args.queue:
+        # Folders move between nodes, so a per-node manifest would not know what was done; the queue does
+        if args.manifest:
+            print("Error: --manifest cannot be used with --queue; the queue keeps track of finished folders",
+                  file=sys.stderr)
+            return 2
+        run_queue_worker(args.queue, args.raw_dir, args.disclosure_dir, args.supplementary_dir,
+                         args.disclosure_text_dir, args.desensitized_dir, args.output_dir, args.workers,
+                         args.link_mode, args.row_group_size, args.strategies, args.time_budget, args.page_timeout,
+                         args.report, args.prometheus_textfile, args.page_cache, args.page_cache_size,
+                         args.classify_by, args.dedup, args.lease_size, args.lease_seconds, memory_limits(args))
+        return
+
+    run_pipeline(args.raw_dir, args.disclosure_dir, args.supplementary_dir, args.disclosure_text_dir,
+                 args.desensitized_dir, args.output_dir, args.workers, args.manifest,
+                 args.link_mode, args.row_group_size, args.strategies, args.time_budget, args.page_timeout,
+                 args.report, args.prometheus_textfile, args.page_cache, args.page_cache_size, args.classify_by,
+                 args.dedup, args.resume, args.checkpoint_interval, memory_limits(args))
+
+    # Print text file output info
+    txt_files = glob.glob(os.path.join(args.disclosure_text_dir, "**/*.txt"), recursive=True)
+    print(f"\nCreated {len(txt_files)} text files in {args.disclosure_text_dir}")
+
+def merge_command(args):
+    """Combine the per-folder parts written by sharded runs and watch mode into all_extracted_texts.parquet."""
+    if not os.path.isdir(os.path.join(args.output_dir, PARTS_DIR)):
+        print(f"Error: no {PARTS_DIR} directory in {args.output_dir}", file=sys.stderr)
+        return 1
+    _, missing = merge_parts(args.output_dir, args.raw_dir, args.row_group_size)
+    return 1 if missing else 0
+
+def watch_command(args):
+    """Run the single-pass pipeline on each new or changed raw folder once it has been fully written."""
+    watch_pipeline(args.raw_dir, args.disclosure_dir, args.supplementary_dir, args.disclosure_text_dir,
+                   args.desensitized_dir, args.output_dir, args.workers, args.manifest, args.link_mode,
+                   args.row_group_size, args.strategies, args.time_budget, args.page_timeout, args.report,
+                   args.prometheus_textfile, args.page_cache, args.page_cache_size, args.classify_by, args.dedup,
+                   args.settle, args.poll_interval, args.polling, memory_limits(args))
+
+def serve_command(args):
+    """Serve text extraction and desensitization over HTTP on localhost, with a warm worker pool."""
+    from disclosure_cleanup.service import serve
+
+    serve(args.port, args.workers, args.max_pending, args.max_batch, args.max_body_mb, args.allowed_dirs,
+          args.strategies, args.threshold, args.normalizer, args.streaming, args.time_budget, args.page_timeout,
+          args.eager_pages, args.page_cache, args.page_cache_size, memory_limits(args), args.request_timeout)
+
+def build_parser():
+    """The argument parser with one subcommand per stage."""
+    parser = argparse.ArgumentParser(prog="python -m disclosure_cleanup",
+                                     description="Clean up invention disclosure forms")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    select = commands.add_parser("select", help="Classify raw PDFs into disclosures and supplementary documents",
+                                 description=select_command.__doc__)
+    add_selection_arguments(select)
+    select.set_defaults(func=select_command)
+
+    extract = commands.add_parser("extract", help="Extract disclosure text up to Section III",
+                                  description=extract_command.__doc__)
+    extract.add_argument("pdfs", nargs="*",
+                         help="PDFs to extract; their text is printed and no parquet or text files are written")
+    add_extraction_arguments(extract)
+    extract.set_defaults(func=extract_command)
+
+    desensitize = commands.add_parser("desensitize", help="Remove the contributor/signature section",
+                                      description=desensitize_command.__doc__)
+    add_desensitize_arguments(desensitize)
+    desensitize.set_defaults(func=desensitize_command)
+
+    run = commands.add_parser("run", help="Run all stages on each raw PDF in a single pass",
+                              description=run_command.__doc__)
+    add_pipeline_arguments(run)
+    add_checkpoint_arguments(run)
+    add_shard_arguments(run)
+    run.set_defaults(func=run_command)
+
+    merge = commands.add_parser("merge", help="Combine the parts written by sharded runs and watch mode",
+                                description=merge_command.__doc__)
+    add_merge_arguments(merge)
+    merge.set_defaults(func=merge_command)
+
+    watch = commands.add_parser("watch", help="Process raw folders as they land, until interrupted",
+                                description=watch_command.__doc__)
+    add_watch_arguments(watch)
+    watch.set_defaults(func=watch_command)
+
+    serve_parser = commands.add_parser("serve", help="Serve extraction and desensitization over HTTP on localhost",
+                                       description=serve_command.__doc__)
+    add_service_arguments(serve_parser)
+    serve_parser.set_defaults(func=serve_command)
+    return parser
+
+def main(argv=None):
+    # Handle broken pipe errors in Python
+    if hasattr(signal, 'SIGPIPE'):
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    # Turn SIGTERM (e.g. preemption) into SystemExit so the parquet footer is still written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,141 @@
+"""
+Content-hash deduplication of PDFs that appear under several disclosure folders.
+
+Files can only have the same content if they have the same size, so only
+files sharing their size with another are hashed, with the streaming
+BLAKE2b content hash the manifests use. Hard links of one file are hashed
+once, and hashes recorded in a manifest for unchanged files are reused
+without reading the files again.
+
+Each group of identical files has one original, which the stages process
+as usual. The other files are duplicates: they get the original's results
+(its classification, text and desensitized PDF) without being parsed, and
+their output files are hard links of the original's outputs, so each
+unique document is stored once.
+"""
+import os
+import shutil
+from collections import namedtuple
+from disclosure_cleanup.atomic import discard, temporary_path
+from disclosure_cleanup.manifest import content_hash
+from disclosure_cleanup.parallel import imap_ordered
+
+DUPLICATES_TABLE = "duplicates.parquet"
+
+Duplicate = namedtuple("Duplicate", ["content_hash", "original", "size"])
+
+def hash_file(path):
+    """Content hash of a file, or None if it cannot be read."""
+    try:
+        return content_hash(path)
+    except OSError as e:
+        print(f"Error hashing {path}: {str(e)}")
+        return None
+
+def find_duplicates(paths, known_hashes=None, prefer=(), workers=1):
+    """
+    Return {path: Duplicate} for every path whose content is shared with another path.
+
+    known_hashes maps paths to hashes that are already known, which are
+    used instead of reading those files. The original of each group is
+    its first path that is in `prefer` (e.g. files whose outputs already
+    exist), or else its first path. Originals are included in the result,
+    as their own original; files that cannot be read are left out.
+    """
+    known_hashes = known_hashes or {}
+    sizes = {}
+    inodes = {}
+    by_size = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        sizes[path] = stat.st_size
+        inodes[path] = (stat.st_dev, stat.st_ino)
+        by_size.setdefault(stat.st_size, []).append(path)
+    candidates = [path for group in by_size.values() if len(group) > 1 for path in group]
+
+    # Hash each inode that shares its size at most once
+    inode_hashes = {inodes[path]: known_hashes[path] for path in candidates if known_hashes.get(path)}
+    to_hash = {}
+    for path in candidates:
+        if inodes[path] not in inode_hashes:
+            to_hash.setdefault(inodes[path], path)
+    for path, digest in imap_ordered(hash_file, list(to_hash.values()), workers):
+        if digest is not None:
+            inode_hashes[inodes[path]] = digest
+
+    groups = {}
+    for path in candidates:
+        digest = inode_hashes.get(inodes[path])
+        if digest is not None:
+            groups.setdefault(digest, []).append(path)
+
+    prefer = set(prefer)
+    order = {path: i for i, path in enumerate(paths)}
+    duplicates = {}
+    for digest, group in groups.items():
+        if len(group) < 2:
+            continue
+        group.sort(key=order.get)
+        original = next((path for path in group if path in prefer), group[0])
+        for path in group:
+            duplicates[path] = Duplicate(digest, original, sizes[path])
+    return duplicates
+
+def original_of(duplicates, path):
+    """The path whose results path shares, or None if path is processed itself."""
+    duplicate = duplicates.get(path)
+    if duplicate is None or duplicate.original == path:
+        return None
+    return duplicate.original
+
+def link_output(original_output, output):
+    """
+    Place a duplicate's output as a hard link of the original's output (a copy where that is not possible).
+
+    Returns the mode used, or None if both are the same path.
+    """
+    if os.path.abspath(original_output) == os.path.abspath(output):
+        return None
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp_path = temporary_path(output)
+    try:
+        try:
+            os.link(original_output, tmp_path)
+            mode = "hardlink"
+        except OSError:
+            # Across devices or on filesystems without hard links
+            shutil.copy2(original_output, tmp_path)
+            mode = "copy"
+        os.replace(tmp_path, output)
+        return mode
+    finally:
+        discard(tmp_path)
+
+def write_duplicates_table(path, duplicates, paths):
+    """Write the path -> original mapping of the duplicate groups, in the order of paths."""
+    from disclosure_cleanup.parquet_writer import DUPLICATES_SCHEMA, ParquetRowWriter
+
+    with ParquetRowWriter(path, schema=DUPLICATES_SCHEMA) as writer:
+        for pdf_path in paths:
+            duplicate = duplicates.get(pdf_path)
+            if duplicate is not None:
+                writer.write({'path': pdf_path, 'content_hash': duplicate.content_hash,
+                              'original': duplicate.original, 'size': duplicate.size})
+
+def print_duplicate_summary(duplicates):
+    """Print how many files are duplicates and how many bytes they account for."""
+    copies = [duplicate for path, duplicate in duplicates.items() if duplicate.original != path]
+    if copies:
+        originals = len({duplicate.original for duplicate in copies})
+        megabytes = sum(duplicate.size for duplicate in copies) / (1 << 20)
+        print(f"Found {len(copies)} duplicates of {originals} files ({megabytes:.1f} MB), "
+              "which reuse the results of those files")
+
+def add_dedup_arguments(parser):
+    """Add the deduplication option to an argparse parser."""
+    parser.add_argument("--dedup", action="store_true",
+                       help="Process PDFs with identical content once and hard-link the results to every copy")
+    return parser
@@ -0,0 +1,444 @@
+"""
+Removal of the contributor/signature section from disclosure forms.
+
+The section starts on the first page that matches one of several checks,
+tried in order of precedence: exact phrases, a regex, keyword
+combinations and, for longer documents, signature terms in the last third.
+Everything before that page is kept.
+"""
+import io
+import os
+import re
+import time
+from collections import namedtuple
+from pathlib import Path
+from disclosure_cleanup.atomic import atomic_write
+from disclosure_cleanup.budget import Deadline, TimeBudgetExceeded, add_budget_arguments, page_limit
+from disclosure_cleanup.dedup import (add_dedup_arguments, find_duplicates, link_output, original_of,
+                                      print_duplicate_summary)
+from disclosure_cleanup.manifest import CHECKPOINT_SECONDS, add_checkpoint_arguments, checkpoint_path, open_manifest
+from disclosure_cleanup.memory import add_memory_arguments, check_memory, release_memory, release_pages
+from disclosure_cleanup.metrics import FileMetrics, RunReport, add_report_arguments
+from disclosure_cleanup.page_cache import (DEFAULT_CACHE_SIZE_MB, add_cache_arguments, cached_reader, open_cache,
+                                          real_reader, save_cached_pages)
+from disclosure_cleanup.selection import find_pdf_files
+from disclosure_cleanup.sources import file_size, is_path, open_source, source_hash, source_name
+
+# Marker phrases to identify where to cut the document
+MARKER_PHRASES = [
+    "contributor must sign this form confirming the accuracy",
+    "For additional Contributors, simply copy the table",
+    "At least one contributor must sign",
+    "confirming the accuracy of the information provided",
+    "copy the table below and paste at the end of the document"
+]
+
+# Page texts are lowercased before matching
+LOWER_MARKER_PHRASES = [phrase.lower() for phrase in MARKER_PHRASES]
+
+# Regex pattern for more flexible matching
+MARKER_PATTERN = re.compile(r'contributor.*sign.*form.*accuracy|copy.*table.*end.*document', re.IGNORECASE)
+
+# Words each branch of MARKER_PATTERN needs; a page lacking them cannot match...
+MARKER_PATTERN_WORDS = [{"contributor", "sign", "form", "accuracy"}, {"copy", "table", "end", "document"}]
+# ...unless it has characters that IGNORECASE matches to ASCII letters (e.g. long s for "s")
+CASE_FOLDED_CHARS = "\u017f\u0131\u212a\u0130"
+
+# At least three of these words on a page mark the signature section
+KEYWORD_COMBINATION = {"contributor", "sign", "form", "accuracy", "table", "copy"}
+
+# Terms looked for in the last third of longer documents
+SIGNATURE_TERMS = {"sign", "contributor"}
+
+# Every word any of the checks looks for, searched once per page
+MARKER_KEYWORDS = sorted(KEYWORD_COMBINATION | SIGNATURE_TERMS | set().union(*MARKER_PATTERN_WORDS))
+
+# Outcome of desensitizing one PDF: pages kept, the marker page and the check that found it
+# (both None when the fallback heuristics decided)
+Desensitized = namedtuple("Desensitized", ["pages_kept", "marker_page", "method"])
+
+# Outcome of desensitize_bytes: the desensitized PDF (None unless status is "ok") and how it was cut
+DesensitizeResult = namedtuple("DesensitizeResult",
+                               ["pdf", "pages_kept", "marker_page", "method", "status", "reason", "metrics"])
+
+class LazyPageTexts:
+    """
+    Lowercased page texts of an opened PDF, each extracted on first access.
+
+    An unreadable page reads as an empty string. Pages that take longer than
+    page_timeout seconds count as unreadable; running past the deadline
+    raises TimeBudgetExceeded. Per-page times go to metrics.page_seconds.
+
+    With low_memory (MemoryLimits), each page's parsed objects are released
+    once its text is extracted, only the texts that fit in
+    low_memory.max_text_chars are kept (later pages are extracted again
+    each time they are read) and going over the memory ceiling raises
+    MemoryLimitExceeded. texts are the lowercased texts of the first pages
+    if they were extracted already.
+    """
+
+    def __init__(self, reader, page_timeout=None, deadline=None, metrics=None, low_memory=None, texts=()):
+        self.reader = reader
+        self.pages = reader.pages
+        self.page_timeout = page_timeout
+        self.deadline = deadline
+        self.metrics = metrics
+        self.low_memory = low_memory
+        self.texts = dict(enumerate(texts))
+        self.text_chars = sum(len(text) for text in texts)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __getitem__(self, i):
+        if i in self.texts:
+            return self.texts[i]
+        text = self.extract(i)
+        if self.low_memory is None or self.text_chars + len(text) <= self.low_memory.max_text_chars:
+            self.texts[i] = text
+            self.text_chars += len(text)
+        return text
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def extract(self, i):
+        """Extract the lowercased text of page i."""
+        if self.deadline is not None:
+            self.deadline.check(f"after extracting {len(self.texts)} pages")
+        start = time.perf_counter()
+        try:
+            with page_limit(self.page_timeout, self.deadline, i + 1):
+                text = self.pages[i].extract_text().lower()
+        except TimeBudgetExceeded:
+            raise
+        except Exception:
+            text = ""
+        finally:
+            if self.metrics is not None:
+                self.metrics.page_seconds.append(time.perf_counter() - start)
+                self.metrics.timings['extract'] = self.metrics.timings.get('extract', 0.0) + \
+                    time.perf_counter() - start
+        if self.low_memory is not None:
+            release_pages(self.reader)
+            check_memory(self.low_memory, f"after extracting page {i + 1}")
+        return text
+
+def extract_page_texts(reader, page_timeout=None, deadline=None, metrics=None):
+    """Extract the lowercased text of every page up front, using an empty string for unreadable pages."""
+    return list(LazyPageTexts(reader, page_timeout, deadline, metrics))
+
+def find_marker(page_texts):
+    """
+    Find the page where the contributor/signature section starts.
+
+    Returns (page index, method) where method names the check that found it
+    ("phrase", "regex", "keywords" or "signature"), or (None, None).
+
+    Each page is read and scanned once, for all four checks: its phrases,
+    then every word the other checks need, once, and the regex only if the
+    page contains the words it needs. The checks keep their order of
+    precedence (a phrase on any page wins over a regex match on an earlier
+    one): the first page with a phrase is returned right away, and for the
+    other checks the first matching page is noted and the winner picked
+    once every page has been scanned.
+
+    Pages are read strictly front to back, so with LazyPageTexts nothing
+    after the first page with a phrase is ever extracted. Probing likely
+    pages first would not save anything: a phrase on an earlier page takes
+    precedence, so every page before the marker has to be read anyway.
+    """
+    total_pages = len(page_texts)
+    start_check = int(total_pages * 0.67) if total_pages > 5 else total_pages
+    regex_page = None
+    keyword_page = None
+    signature_page = None
+    for i, text in enumerate(page_texts):
+        # First: exact phrases
+        if any(phrase in text for phrase in LOWER_MARKER_PHRASES):
+            return i, "phrase"
+        if regex_page is not None:
+            # Only a phrase on a later page can still win
+            continue
+
+        present = {keyword for keyword in MARKER_KEYWORDS if keyword in text}
+        
+        # Second: regex pattern; the first matching page wins over the checks below
+        if (any(words <= present for words in MARKER_PATTERN_WORDS)
+                or any(ch in text for ch in CASE_FOLDED_CHARS)) and MARKER_PATTERN.search(text):
+            regex_page = i
+            continue
+        
+        # Third: keyword combinations
+        if keyword_page is None and len(present & KEYWORD_COMBINATION) >= 3:
+            keyword_page = i
+        
+        # Last resort: signature terms in the last third of longer documents ("signature" contains "sign")
+        if signature_page is None and i >= start_check and present & SIGNATURE_TERMS:
+            signature_page = i
+    
+    if regex_page is not None:
+        return regex_page, "regex"
+    if keyword_page is not None:
+        return keyword_page, "keywords"
+    if signature_page is not None:
+        return signature_page, "signature"
+    return None, None
+
+def find_marker_page(page_texts):
+    """Find the page where the contributor/signature section starts, or None."""
+    return find_marker(page_texts)[0]
+
+def desensitize_reader(reader, page_texts, output, metrics=None, low_memory=None):
+    """
+    Write the pages of an opened PDF that come before the sensitive section to output.
+
+    output is a path or a writable binary file. Returns a Desensitized tuple.
+    With low_memory (MemoryLimits), the reader's parsed objects are released
+    after each page is copied and the memory ceiling is checked; the kept
+    pages themselves stay in the writer until it is written.
+    """
+    import PyPDF2
+
+    metrics = metrics or FileMetrics("desensitize", source_name(output))
+    writer = PyPDF2.PdfWriter()
+    total_pages = len(reader.pages)
+    
+    # Find the page that contains the marker text
+    extract_before = metrics.timings.get("extract", 0.0)
+    with metrics.timer("match"):
+        marker_page, method = find_marker(page_texts)
+    # Pages extracted on demand during the search count as extraction, not matching
+    metrics.timings['match'] -= metrics.timings.get("extract", 0.0) - extract_before
+    metrics.methods['marker_method'] = method or "fallback"
+    
+    # Process based on results
+    if marker_page is not None:
+        # Keep pages before marker page
+        pages_kept = marker_page
+    else:
+        # Fallback: use heuristics based on document type
+        doc_title = reader.metadata.get('/Title', '').lower() if reader.metadata else ''
+        
+        if (total_pages > 10 and 
+            ('disclosure' in doc_title or 'invention' in doc_title or 'patent' in doc_title)):
+            # Keep first 2/3 of pages
+            pages_kept = int(total_pages * 0.67)
+        else:
+            # Keep first 80% of pages
+            pages_kept = int(total_pages * 0.8)
+    for i in range(pages_kept):
+        writer.add_page(reader.pages[i])
+        if low_memory is not None:
+            release_pages(reader)
+            check_memory(low_memory, f"after copying page {i + 1}")
+    
+    # Add blank page if needed
+    if pages_kept == 0:
+        writer.add_blank_page(width=595, height=842)  # A4 size
+        
+    # Write the output file
+    with metrics.timer("write"):
+        if is_path(output):
+            with atomic_write(output, 'wb') as output_file:
+                writer.write(output_file)
+                metrics.bytes_written += output_file.tell()
+        else:
+            start = output.tell()
+            writer.write(output)
+            metrics.bytes_written += output.tell() - start
+    return Desensitized(pages_kept, marker_page, method)
+
+def desensitize_document(source, output, time_budget=None, page_timeout=None, metrics=None, eager_pages=False,
+                         cache=None, low_memory=None):
+    """
+    Remove the sensitive section of one PDF and write the rest to output.
+
+    source is a path, bytes or a binary file-like object and output a path
+    or a writable binary file. Page text is extracted on demand, only as far
+    as the marker search needs it; eager_pages extracts every page up front
+    instead. Pages already in the page cache `cache` are not extracted again.
+    With low_memory (MemoryLimits), a path is memory-mapped and the memory
+    limits apply as described in LazyPageTexts and desensitize_reader.
+
+    Raises TimeBudgetExceeded, before anything is written, if the document
+    runs over time_budget seconds, and MemoryLimitExceeded if it takes the
+    process over the memory ceiling.
+    """
+    import PyPDF2
+
+    metrics = metrics or FileMetrics("desensitize", source_name(source) or "<bytes>")
+    try:
+        with open_source(source, mapped=low_memory is not None) as file:
+            metrics.bytes_read = file_size(file)
+            with metrics.timer("open"):
+                reader = cached_reader(cache, lambda: PyPDF2.PdfReader(file), lambda: source_hash(source, file))
+            try:
+                page_texts = LazyPageTexts(reader, page_timeout, Deadline(time_budget), metrics, low_memory)
+                if eager_pages:
+                    page_texts = list(page_texts)
+                return desensitize_reader(real_reader(reader), page_texts, output, metrics, low_memory)
+            finally:
+                save_cached_pages(reader)
+    finally:
+        if low_memory is not None:
+            release_memory()
+
+def process_pdf(input_path, output_path, time_budget=None, page_timeout=None, timeouts=None, metrics=None,
+                eager_pages=False, cache=None, low_memory=None):
+    """
+    Process a PDF file to remove sensitive sections (see desensitize_document).
+
+    A file that runs over time_budget seconds is not written at all, so no
+    partially checked document is ever published; it is appended to
+    `timeouts` as (input_path, reason) instead. Timings and byte counts are
+    recorded in `metrics` if given.
+    """
+    metrics = metrics or FileMetrics("desensitize", input_path)
+    # Create output directory if it doesn't exist
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    
+    try:
+        desensitize_document(input_path, output_path, time_budget, page_timeout, metrics, eager_pages, cache,
+                             low_memory)
+        metrics.finish("ok")
+        return True
+    except TimeBudgetExceeded as e:
+        print(f"Timed out processing {input_path}: {str(e)}")
+        if timeouts is not None:
+            timeouts.append((input_path, str(e)))
+        metrics.finish("timeout")
+        return False
+    except Exception as e:
+        print(f"Error processing {input_path}: {str(e)}")
+        metrics.finish("error")
+        return False
+
+def desensitize_bytes(source, time_budget=None, page_timeout=None, eager_pages=False, cache_path=None,
+                      cache_size_mb=DEFAULT_CACHE_SIZE_MB, low_memory=None):
+    """
+    Desensitize one PDF in memory and return a DesensitizeResult with the bytes of the output PDF.
+
+    A document that goes over the memory ceiling of low_memory (MemoryLimits)
+    is reported with status "error".
+    """
+    name = source_name(source) or "<bytes>"
+    metrics = FileMetrics("desensitize", name)
+    output = io.BytesIO()
+    try:
+        kept = desensitize_document(source, output, time_budget, page_timeout, metrics, eager_pages,
+                                    open_cache(cache_path, cache_size_mb), low_memory)
+    except TimeBudgetExceeded as e:
+        return DesensitizeResult(None, None, None, None, "timeout", str(e), metrics.finish("timeout"))
+    except Exception as e:
+        print(f"Error processing {name}: {str(e)}")
+        return DesensitizeResult(None, None, None, None, "error", str(e), metrics.finish("error"))
+    return DesensitizeResult(output.getvalue(), *kept, "ok", None, metrics.finish("ok"))
+
+def batch_process_pdfs(input_dir, output_dir, manifest_path=None, time_budget=None, page_timeout=None,
+                       report_path=None, prometheus_path=None, eager_pages=False, cache_path=None,
+                       cache_size_mb=DEFAULT_CACHE_SIZE_MB, dedup=False, resume=False,
+                       checkpoint_interval=CHECKPOINT_SECONDS, low_memory=None):
+    """
+    Process all PDF files in the input directory, reporting per-file metrics to report_path.
+
+    With dedup, each content is desensitized once and the output is
+    hard-linked for the other files with the same content. Finished files
+    are checkpointed (see open_manifest); with resume, the files an
+    interrupted run finished are skipped. low_memory (MemoryLimits) turns
+    on low-memory mode (see desensitize_document).
+    """
+    from tqdm import tqdm
+
+    print(f"Starting desensitization process from {input_dir}...")
+    
+    input_path = Path(input_dir)
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True, parents=True)
+    
+    # Get list of all PDF files (recursively)
+    pdf_files = [Path(pdf_file) for pdf_file in find_pdf_files(input_dir)]
+    total_files = len(pdf_files)
+    print(f"Found {total_files} PDF files to process")
+    
+    # Skip unchanged files (in incremental mode) and files done before an interruption
+    manifest, is_checkpoint = open_manifest(manifest_path, checkpoint_path(output_dir, "desensitize"), resume,
+                                            checkpoint_interval)
+    removed = manifest.remove_stale(str(pdf_file) for pdf_file in pdf_files)
+    if removed:
+        print(f"Removed outputs of {len(removed)} deleted files")
+    current = {str(pdf_file) for pdf_file in pdf_files if manifest.is_current(str(pdf_file))}
+
+    # Files with the same content as an unchanged file reuse its output
+    duplicates = {}
+    if dedup:
+        duplicates = find_duplicates([str(pdf_file) for pdf_file in pdf_files],
+                                     {path: manifest.recorded_hash(path) for path in current}, current)
+        print_duplicate_summary(duplicates)
+    original_outputs = {path: manifest.outputs(path)[0] for path in current if path in duplicates}
+    
+    processed_count = 0
+    skipped_count = 0
+    timeouts = []
+    cache = open_cache(cache_path, cache_size_mb)
+    
+    # Process with progress bar
+    try:
+        with RunReport(report_path, prometheus_path) as report:
+            for pdf_file in tqdm(pdf_files, desc="Desensitizing documents", unit="file"):
+                output_file = output_path / pdf_file.name
+                if str(pdf_file) in current:
+                    skipped_count += 1
+                    processed_count += 1
+                    continue
+                metrics = FileMetrics("desensitize", pdf_file)
+                original = original_of(duplicates, str(pdf_file))
+                if original is not None:
+                    # Same content as a file desensitized before: link its output
+                    metrics.methods['dedup'] = "duplicate"
+                    if original not in original_outputs:
+                        report.add(metrics.finish("error"))
+                        continue
+                    with metrics.timer("write"):
+                        metrics.methods['link_mode'] = link_output(original_outputs[original], str(output_file))
+                    processed_count += 1
+                    manifest.record(str(pdf_file), [output_file], duplicates[str(pdf_file)].content_hash)
+                    report.add(metrics.finish("ok"))
+                    continue
+                if process_pdf(str(pdf_file), str(output_file), time_budget, page_timeout, timeouts, metrics,
+                               eager_pages, cache, low_memory):
+                    processed_count += 1
+                    if str(pdf_file) in duplicates:
+                        original_outputs[str(pdf_file)] = str(output_file)
+                    manifest.record(str(pdf_file), [output_file])
+                report.add(metrics)
+    finally:
+        # Also on Ctrl-C or SIGTERM, so the files done so far are not desensitized again
+        manifest.save()
+    if is_checkpoint:
+        manifest.discard()
+    
+    print(f"Completed: {processed_count}/{total_files} files processed")
+    if skipped_count:
+        print(f"- {skipped_count} already done")
+    if timeouts:
+        print(f"- {len(timeouts)} timed out:")
+        for pdf_file, reason in timeouts:
+            print(f"  - {pdf_file}: {reason}")
+
+def add_desensitize_arguments(parser):
+    """Add the options of the desensitize stage to an argparse parser."""
+    parser.add_argument("--disclosure-dir", default="data/disclosure", help="Directory containing disclosure forms")
+    parser.add_argument("--desensitized-dir", default="data/desensitized", help="Directory to save desensitized forms")
+    parser.add_argument("--manifest", default=None,
+                       help="Manifest file for incremental runs; unchanged PDFs are skipped")
+    parser.add_argument("--eager-pages", action="store_true",
+                       help="Extract the text of every page up front instead of only as far as the marker")
+    add_dedup_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_budget_arguments(parser)
+    add_report_arguments(parser)
+    add_cache_arguments(parser)
+    add_memory_arguments(parser)
+    return parser
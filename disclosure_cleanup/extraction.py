@@ -0,0 +1,880 @@
+"""
+Extraction of disclosure form text up to Section III.
+
+The boundary of Section III ("III. ADDITIONAL INFORMATION & SUPPORTING
+DOCUMENTS") is located by a chain of strategies. Each strategy is registered
+with an estimated cost and the chain runs cheapest-first, so exact substring
+and regex checks resolve most documents before the fuzzy scans are needed.
+"""
+import os
+import re
+import time
+import bisect
+import difflib
+import itertools
+import functools
+from collections import namedtuple
+from pathlib import Path
+from disclosure_cleanup.atomic import atomic_write
+from disclosure_cleanup.budget import (Deadline, PageTimeout, TimeBudgetExceeded, add_budget_arguments, page_limit,
+                                      time_limit)
+from disclosure_cleanup.dedup import (DUPLICATES_TABLE, add_dedup_arguments, find_duplicates, original_of,
+                                      print_duplicate_summary, write_duplicates_table)
+from disclosure_cleanup.manifest import CHECKPOINT_SECONDS, add_checkpoint_arguments, checkpoint_path, open_manifest
+from disclosure_cleanup.memory import add_memory_arguments, check_memory, release_memory, release_pages
+from disclosure_cleanup.metrics import FileMetrics, RunReport, add_report_arguments
+from disclosure_cleanup.page_cache import (DEFAULT_CACHE_SIZE_MB, add_cache_arguments, cached_reader, open_cache,
+                                           save_cached_pages)
+from disclosure_cleanup.parallel import imap_ordered
+from disclosure_cleanup.sources import file_size, open_source, source_hash, source_name
+
+# Define target section markers
+SECTION_MARKERS = [
+    "III. ADDITIONAL INFORMATION & SUPPORTING DOCUMENTS",
+    "III ADDITIONAL INFORMATION & SUPPORTING DOCUMENTS",
+    "III. ADDITIONAL INFORMATION AND SUPPORTING DOCUMENTS",
+    "III ADDITIONAL INFORMATION AND SUPPORTING DOCUMENTS",
+    "III. ADDITIONAL INFORMATION",
+    "III ADDITIONAL INFORMATION",
+    "ADDITIONAL INFORMATION & SUPPORTING DOCUMENTS",
+    "ADDITIONAL INFORMATION AND SUPPORTING DOCUMENTS",
+    "SECTION III ADDITIONAL INFORMATION",
+    "SECTION III: ADDITIONAL INFORMATION",
+    "3. ADDITIONAL INFORMATION"
+]
+
+# Regex patterns for section headers: Roman numeral III or digit 3 followed by "Additional Information"
+SECTION_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in [
+        r'(?:^|\n|\s+)(?:III|3)\.?\s+.*?(?:ADDITIONAL|SUPPORTING).*?(?:INFORMATION|DOCUMENTS)',
+        r'(?:^|\n|\s+)ADDITIONAL\s+INFORMATION(?:\s+(?:&|AND)\s+SUPPORTING\s+DOCUMENTS)?',
+        r'(?:^|\n|\s+)(?:SECTION|PART)\s+(?:III|3)(?:\:|\.|,)?\s+',
+        r'(?:^|\n|\s+)(?:III|3)(?:\:|\.|,)\s*ADDITIONAL'
+    ]
+]
+
+# Page header hinting at section III, checked on the first lines of each page
+PAGE_HEADER_PATTERN = re.compile(r'(?:III|3)\.?\s+.*?INFORMATION', re.IGNORECASE)
+
+# Layouts of the text output tree relative to the disclosure tree
+TEXT_LAYOUTS = ["mirror", "clean"]
+
+def normalize_text(text):
+    """Normalize text for fuzzy matching."""
+    # Remove whitespace and convert to lowercase
+    return re.sub(r'\s+', '', text.lower())
+
+def collapse_spaces(text):
+    """Normalize text by lowercasing and collapsing runs of spaces into one."""
+    return re.sub(r' {2,}', ' ', text.lower())
+
+NORMALIZERS = {
+    "compact": normalize_text,
+    "collapse": collapse_spaces,
+}
+
+# Strategies up to this cost still run once a document's time budget is spent
+CHEAP_STRATEGY_COST = 3
+
+# Where a strategy cut a document: the text before the marker, the offset of the cut in the
+# document text, the marker it matched (or the text matching a pattern) and, for similarity
+# matches, the similarity score (1.0 for verbatim matches)
+Cut = namedtuple("Cut", ["text", "offset", "marker", "score"], defaults=[None, None, None])
+
+# Compact index of a document kept next to its text, so it can be cut again elsewhere without
+# extracting it again. Offsets are into the document text: the extracted page texts, each followed
+# by a newline. page_offsets holds where each extracted page starts, then the length of the text;
+# page_count counts all pages of the PDF, which may be more than were extracted. marker_offset is
+# where the marker starts (the boundary text is what comes before it, stripped) and marker_page the
+# page it is on
+SectionIndex = namedtuple("SectionIndex", ["page_count", "page_offsets", "marker", "marker_page", "marker_offset",
+                                           "score"])
+
+# Result of a boundary search: the text before Section III, the strategy that found it and the SectionIndex
+SectionBoundary = namedtuple("SectionBoundary", ["text", "strategy", "index"], defaults=[None])
+
+# Outcome of extracting one PDF. status is "ok", "no-marker", "timeout" or "error";
+# reason explains anything other than a clean "ok"; metrics holds its FileMetrics and
+# index the SectionIndex of an "ok" document
+ExtractionResult = namedtuple("ExtractionResult", ["text", "strategy", "status", "reason", "metrics", "index"],
+                              defaults=[None, None])
+
+# A registered boundary strategy
+Strategy = namedtuple("Strategy", ["name", "cost", "func"])
+
+STRATEGIES = {}
+
+def register_strategy(name, cost):
+    """
+    Register a boundary strategy under `name` with an estimated relative cost.
+
+    The decorated function takes a Document and returns a Cut, or None if it
+    could not find the marker. Returning just the text before the marker
+    also works, but leaves the marker out of the SectionIndex.
+    """
+    def decorator(func):
+        STRATEGIES[name] = Strategy(name, cost, func)
+        return func
+    return decorator
+
+def build_chain(names=None):
+    """Return the strategies called `names` (default: all), ordered cheapest-first."""
+    if names is None:
+        names = list(STRATEGIES)
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(unknown)} (available: {', '.join(STRATEGIES)})")
+    return sorted((STRATEGIES[name] for name in names), key=lambda strategy: strategy.cost)
+
+def parse_strategy_list(value):
+    """argparse type for a comma-separated list of strategy names."""
+    import argparse
+
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    try:
+        build_chain(names)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return names
+
+class Document:
+    """Extracted page texts plus lazily computed views shared by the strategies."""
+
+    def __init__(self, page_texts, threshold=0.7, normalizer="compact", markers=SECTION_MARKERS):
+        self.page_texts = page_texts
+        self.full_text = "".join(page_text + "\n" for page_text in page_texts)
+        self.threshold = threshold
+        self.normalize = NORMALIZERS[normalizer]
+        self.markers = markers
+
+    @functools.cached_property
+    def lines(self):
+        return self.full_text.splitlines()
+
+    @functools.cached_property
+    def line_offsets(self):
+        """Where each line starts in full_text, then the length of full_text."""
+        return [0, *itertools.accumulate(len(line) for line in self.full_text.splitlines(keepends=True))]
+
+    @functools.cached_property
+    def page_offsets(self):
+        """Where each page starts in full_text, then the length of full_text."""
+        return [0, *itertools.accumulate(len(page_text) + 1 for page_text in self.page_texts)]
+
+    @functools.cached_property
+    def normalized_lines(self):
+        return [self.normalize(line) for line in self.lines]
+
+    @functools.cached_property
+    def normalized_markers(self):
+        return [self.normalize(marker) for marker in self.markers]
+
+    @functools.cached_property
+    def normalized_text(self):
+        return self.normalize(self.full_text)
+
+def line_matches_marker(line_normalized, marker_normalized, threshold=0.7):
+    """Check whether a normalized line contains or closely resembles a normalized marker."""
+    # First try exact substring match
+    if marker_normalized in line_normalized:
+        return True
+
+    # Then try fuzzy ratio matching
+    if len(line_normalized) > 5:  # Avoid matching very short lines
+        similarity = difflib.SequenceMatcher(None, marker_normalized, line_normalized).ratio()
+        if similarity >= threshold:
+            return True
+    return False
+
+@register_strategy("exact", cost=1)
+def exact_line_strategy(doc):
+    """Cut before the first line containing a normalized marker verbatim."""
+    for k, marker_normalized in enumerate(doc.normalized_markers):
+        for i, line_normalized in enumerate(doc.normalized_lines):
+            if marker_normalized in line_normalized:
+                return Cut("\n".join(doc.lines[:i]), doc.line_offsets[i], doc.markers[k], 1.0)
+    return None
+
+def first_header_match(text, pattern):
+    """The first match of a section III header pattern in text that is on a short line, or None."""
+    for match in pattern.finditer(text):
+        # Check if this appears to be a section header (short line)
+        match_line = get_containing_line(text, match.start())
+        if len(match_line) < 100:  # Likely a header not regular text
+            return match
+    return None
+
+@register_strategy("regex", cost=2)
+def regex_strategy(doc):
+    """Cut before the first short line matching a section III header pattern."""
+    full_text = doc.full_text
+    for pattern in SECTION_PATTERNS:
+        match = first_header_match(full_text, pattern)
+        if match:
+            return Cut(full_text[:match.start()], match.start(), match.group().strip())
+    return None
+
+@register_strategy("page", cost=3)
+def page_strategy(doc):
+    """Cut before the first page that starts with a section III header."""
+    page_texts = doc.page_texts
+    for i, page_text in enumerate(page_texts):
+        # Check if page starts with section marker patterns
+        for pattern in SECTION_PATTERNS:
+            match = pattern.search(page_text[:200])
+            if match:
+                # Return all text from previous pages
+                return Cut("\n".join(page_texts[:i]), doc.page_offsets[i], match.group().strip())
+
+        # Look for page headers/footers that might indicate sections
+        for line in page_text.splitlines()[:5]:  # Check first few lines
+            if PAGE_HEADER_PATTERN.search(line):
+                # If found in first page, return nothing; otherwise return previous pages
+                return Cut("\n".join(page_texts[:i]), doc.page_offsets[i], line.strip())
+    return None
+
+# A normalized marker prepared for matching against many lines: the bit masks of its characters
+# for lcs_length and the range of line lengths whose SequenceMatcher ratio can reach the threshold
+MarkerProfile = namedtuple("MarkerProfile", ["text", "masks", "min_length", "max_length"])
+
+@functools.lru_cache(maxsize=256)
+def marker_profile(marker_normalized, threshold):
+    """Profile a normalized marker for first_marker_line at the given threshold."""
+    m = len(marker_normalized)
+    masks = {}
+    for bit, ch in enumerate(marker_normalized):
+        masks[ch] = masks.get(ch, 0) | (1 << bit)
+    if threshold <= 0:
+        min_length, max_length = 0, float("inf")
+    else:
+        # ratio() is at most 2 * min(m, l) / (m + l), the bound real_quick_ratio() computes
+        fitting = [l for l in range(int(2 * m / threshold) + 2)
+                   if m + l and 2.0 * min(m, l) / (m + l) >= threshold]
+        min_length, max_length = (fitting[0], fitting[-1]) if fitting else (1, 0)
+    return MarkerProfile(marker_normalized, masks, min_length, max_length)
+
+def first_marker_line(lines_normalized, markers_normalized, threshold=0.7):
+    """
+    Find the first line matching the first marker that matches any line.
+
+    Returns (line index, marker index, score), where score is the
+    SequenceMatcher ratio or 1.0 if the line contains the marker, or None.
+
+    This is what trying each marker against every line in turn with
+    line_matches_marker finds, computed in one pass over the lines: each
+    line is checked against all markers that could still improve on the
+    match found so far. Before the exact ratio is computed, a marker must
+    pass three upper bounds on it, from cheapest to dearest:
+
+    1. the line length (what real_quick_ratio() computes),
+    2. the characters shared with the line (what quick_ratio() computes),
+       from character counts over the alphabet of the markers that are
+       taken once per line, and
+    3. the longest common subsequence, computed bit-parallel.
+
+    The SequenceMatcher is set up once per line and reused for its markers.
+    """
+    profiles = [marker_profile(marker, threshold) for marker in markers_normalized]
+    alphabet = sorted(set("".join(markers_normalized)))
+    marker_counts = [[marker.count(ch) for ch in alphabet] for marker in markers_normalized]
+
+    # ratio() is 2 * matches / (m + l); matches is at most each bound
+    def passes(matches, total):
+        return 2.0 * matches / total >= threshold
+
+    matcher = difflib.SequenceMatcher(None)
+    found = None
+    # Only markers before this one can still give an earlier answer
+    active = len(profiles)
+    for i, line in enumerate(lines_normalized):
+        if not active:
+            break
+        line_length = len(line)
+        line_counts = None
+        for k in range(active):
+            profile = profiles[k]
+            if profile.text in line:
+                found, active = (i, k, 1.0), k
+                break
+            if line_length <= 5 or not profile.min_length <= line_length <= profile.max_length:
+                continue
+            total = len(profile.text) + line_length
+            if line_counts is None:
+                line_counts = [line.count(ch) for ch in alphabet]
+            if not passes(sum(map(min, marker_counts[k], line_counts)), total):
+                continue
+            if not passes(lcs_length(profile.masks, len(profile.text), line), total):
+                continue
+            matcher.set_seq2(line)
+            matcher.set_seq1(profile.text)
+            score = matcher.ratio()
+            if score >= threshold:
+                found, active = (i, k, score), k
+                break
+    return found
+
+@register_strategy("fuzzy-lines", cost=10)
+def fuzzy_line_strategy(doc):
+    """Cut before the first line that contains or closely resembles a marker, trying markers in order."""
+    found = first_marker_line(doc.normalized_lines, doc.normalized_markers, doc.threshold)
+    if found is None:
+        return None
+    i, k, score = found
+    return Cut("\n".join(doc.lines[:i]), doc.line_offsets[i], doc.markers[k], score)
+
+@register_strategy("sliding-window", cost=100)
+def sliding_window_strategy(doc):
+    """Scan the whole normalized text for an approximate marker match, ignoring line structure."""
+    text = doc.full_text
+    text_normalized = doc.normalized_text
+    for k, marker_normalized in enumerate(doc.normalized_markers):
+        for i in find_approximate_matches(text_normalized, marker_normalized, doc.threshold):
+            # Find the closest line break before this position
+            pos = approximate_original_position(text, text_normalized, i)
+            if pos > 0:
+                # Find the nearest line break before this position
+                line_break = text.rfind('\n', 0, pos)
+                if line_break > 0:
+                    window = text_normalized[i:i + len(marker_normalized)]
+                    score = difflib.SequenceMatcher(None, marker_normalized, window).ratio()
+                    return Cut(text[:line_break], line_break, doc.markers[k], score)
+    return None
+
+def lcs_length(marker_masks, marker_length, window):
+    """Length of the longest common subsequence, using the bit-parallel algorithm of Hyyro."""
+    full = (1 << marker_length) - 1
+    v = full
+    for ch in window:
+        u = v & marker_masks.get(ch, 0)
+        v = ((v + u) | (v - u)) & full
+    return marker_length - bin(v).count("1")
+
+def find_approximate_matches(text_normalized, marker_normalized, threshold):
+    """
+    Yield every offset at which a marker-length window of the text has a
+    SequenceMatcher ratio of at least `threshold` against the marker.
+
+    Offsets are yielded in ascending order, exactly as a naive sliding window
+    would find them. Instead of building a SequenceMatcher at every offset,
+    each window is first checked against two cheap upper bounds on the number
+    of matching characters:
+
+    1. the multiset intersection of window and marker characters, maintained
+       incrementally as the window slides (O(1) per offset), and
+    2. the longest common subsequence, computed bit-parallel.
+
+    Only windows that pass both bounds are verified with SequenceMatcher.
+    """
+    m = len(marker_normalized)
+    n = len(text_normalized)
+    if m == 0 or n < m:
+        return
+
+    # ratio() is 2 * matches / (2 * m) for equal-length sequences
+    def passes(matches):
+        return 2.0 * matches / (2 * m) >= threshold
+
+    marker_counts = {}
+    marker_masks = {}
+    for bit, ch in enumerate(marker_normalized):
+        marker_counts[ch] = marker_counts.get(ch, 0) + 1
+        marker_masks[ch] = marker_masks.get(ch, 0) | (1 << bit)
+
+    window_counts = dict.fromkeys(marker_counts, 0)
+    common = 0
+    for ch in text_normalized[:m]:
+        if ch in window_counts:
+            if window_counts[ch] < marker_counts[ch]:
+                common += 1
+            window_counts[ch] += 1
+
+    for i in range(n - m + 1):
+        if i > 0:
+            # Slide the window one character to the right
+            out_ch = text_normalized[i - 1]
+            if out_ch in window_counts:
+                window_counts[out_ch] -= 1
+                if window_counts[out_ch] < marker_counts[out_ch]:
+                    common -= 1
+            in_ch = text_normalized[i + m - 1]
+            if in_ch in window_counts:
+                if window_counts[in_ch] < marker_counts[in_ch]:
+                    common += 1
+                window_counts[in_ch] += 1
+
+        if not passes(common):
+            continue
+        window = text_normalized[i:i + m]
+        if not passes(lcs_length(marker_masks, m, window)):
+            continue
+        if difflib.SequenceMatcher(None, marker_normalized, window).ratio() >= threshold:
+            yield i
+
+def approximate_original_position(original_text, normalized_text, normalized_pos):
+    """Approximate the position in the original text based on the normalized position."""
+    # Calculate the ratio of positions
+    if len(normalized_text) == 0:
+        return 0
+
+    ratio = len(original_text) / len(normalized_text)
+    approx_pos = int(normalized_pos * ratio)
+
+    # Ensure the position is within bounds
+    return min(approx_pos, len(original_text) - 1)
+
+def get_containing_line(text, position):
+    """Get the line containing the given position in the text."""
+    start = text.rfind('\n', 0, position) + 1
+    end = text.find('\n', position)
+    if end == -1:
+        end = len(text)
+    return text[start:end]
+
+def boundary_is_settled(page_texts, strategies=None, threshold=0.7, normalizer="compact"):
+    """
+    Check whether reading more pages can no longer change the section boundary found in page_texts.
+
+    Used by streaming extraction to decide when to stop reading pages, after
+    each page. The chain's result on a longer document only stays the same if
+    its first strategy already finds, in the pages read, the match it prefers
+    over all others, with some text before it (a cut that keeps nothing
+    passes on to the next strategy):
+
+    - exact and fuzzy-lines: a line containing the first marker verbatim
+      (they try markers in order, and take the first line for a marker)
+    - regex: a short line matching the first header pattern
+    - page: a page starting with a section III header (it takes the first one)
+
+    The new page is checked first, so the pages read so far are only searched
+    again when it has a candidate. A chain led by sliding-window, and forms
+    whose marker only a later marker or pattern matches, are never settled
+    early: the whole document is read, as without streaming.
+    """
+    chain = build_chain(strategies)
+    name = chain[0].name if chain else None
+    page = Document(page_texts[-1:], threshold, normalizer)
+    if name in ("exact", "fuzzy-lines"):
+        marker_normalized = page.normalized_markers[0]
+        if not any(marker_normalized in line for line in page.normalized_lines):
+            return False
+        doc = Document(page_texts, threshold, normalizer)
+        if name == "exact":
+            i = next(i for i, line in enumerate(doc.normalized_lines) if marker_normalized in line)
+        else:
+            i = first_marker_line(doc.normalized_lines, [marker_normalized], threshold)[0]
+        return bool("\n".join(doc.lines[:i]).strip())
+    if name == "regex":
+        if first_header_match(page_texts[-1], SECTION_PATTERNS[0]) is None:
+            return False
+        full_text = Document(page_texts).full_text
+        match = first_header_match(full_text, SECTION_PATTERNS[0])
+        return match is not None and bool(full_text[:match.start()].strip())
+    if name == "page":
+        if page_strategy(page) is None:
+            return False
+        cut = page_strategy(Document(page_texts))
+        return bool(cut.text.strip())
+    return False
+
+def find_section_boundary(page_texts, strategies=None, threshold=0.7, normalizer="compact", deadline=None,
+                          metrics=None):
+    """
+    Run the strategy chain over the extracted page texts.
+
+    Returns a SectionBoundary with the stripped text before the section marker,
+    the name of the strategy that found it and a SectionIndex, or None if no
+    strategy did. The index counts the pages in page_texts as all pages.
+
+    With a deadline, a strategy that runs past it is interrupted and, once it
+    has passed, only strategies up to CHEAP_STRATEGY_COST are tried. If no
+    strategy finds the marker after some were skipped, TimeBudgetExceeded is
+    raised instead of returning None.
+
+    The time spent in each strategy is recorded in metrics.strategy_seconds.
+    """
+    doc = Document(page_texts, threshold, normalizer)
+    deadline = deadline or Deadline()
+    skipped = []
+    for strategy in build_chain(strategies):
+        if deadline.expired():
+            if strategy.cost > CHEAP_STRATEGY_COST:
+                skipped.append(strategy.name)
+                continue
+            limit = None
+        else:
+            limit = deadline.remaining()
+        start = time.perf_counter()
+        try:
+            with time_limit(limit, TimeBudgetExceeded):
+                result = strategy.func(doc)
+        except TimeBudgetExceeded:
+            skipped.append(strategy.name)
+            continue
+        finally:
+            if metrics is not None:
+                metrics.strategy_seconds[strategy.name] = time.perf_counter() - start
+        if isinstance(result, str):
+            result = Cut(result)
+        # A marker on the very first line leaves nothing to keep, so keep looking
+        if result is not None and result.text and result.text.strip():
+            return SectionBoundary(result.text.strip(), strategy.name, section_index(doc, result))
+    if skipped:
+        raise TimeBudgetExceeded(f"time budget of {deadline.seconds:g}s exceeded; "
+                                 f"skipped strategies: {', '.join(skipped)}")
+    return None
+
+def section_index(doc, cut):
+    """The SectionIndex of a document cut by a strategy."""
+    marker_offset = marker_page = None
+    if cut.offset is not None:
+        # Cuts are made at line or page breaks, or at the whitespace before a header
+        marker_offset = len(doc.full_text) - len(doc.full_text[cut.offset:].lstrip())
+        marker_page = min(bisect.bisect_right(doc.page_offsets, marker_offset), len(doc.page_texts)) - 1
+    return SectionIndex(len(doc.page_texts), doc.page_offsets, cut.marker, marker_page, marker_offset, cut.score)
+
+def find_text_until_section(page_texts, strategies=None, threshold=0.7, normalizer="compact"):
+    """Find the section marker in the extracted page texts and return the text before it."""
+    boundary = find_section_boundary(page_texts, strategies, threshold, normalizer)
+    return boundary.text if boundary else None
+
+def extract_page_texts(reader, streaming=False, page_timeout=None, deadline=None, notes=None, metrics=None,
+                       low_memory=None, strategies=None, threshold=0.7, normalizer="compact"):
+    """
+    Extract the text of each page of an opened PDF.
+
+    In streaming mode pages are extracted one at a time and reading stops one
+    page after the boundary the strategies (with threshold and normalizer)
+    will find is settled (see boundary_is_settled), so the boundary is the
+    same as when every page is read, and a header continued on the next page
+    is still complete.
+
+    A page that takes longer than page_timeout seconds, or whose text cannot
+    be extracted, is replaced by an empty string and noted in `notes`;
+    running past the deadline raises TimeBudgetExceeded. Per-page times go to metrics.page_seconds.
+
+    With low_memory (MemoryLimits), each page's parsed objects are released
+    once its text is extracted, reading stops (with a note) once the text
+    reaches low_memory.max_text_chars, and going over the memory ceiling
+    raises MemoryLimitExceeded.
+    """
+    page_texts = []  # Keep individual page texts
+    text_chars = 0
+    marker_seen = False
+    for i, page in enumerate(reader.pages):
+        if deadline is not None:
+            deadline.check(f"after extracting {i} pages")
+        start = time.perf_counter()
+        try:
+            with page_limit(page_timeout, deadline, i + 1):
+                page_texts.append(page.extract_text())
+        except PageTimeout as e:
+            page_texts.append("")
+            if notes is not None:
+                notes.append(str(e))
+        except TimeBudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"Error extracting page {i}: {str(e)}")
+            page_texts.append("")
+            if notes is not None:
+                notes.append(f"page {i + 1} could not be read: {str(e)}")
+        finally:
+            if metrics is not None:
+                metrics.page_seconds.append(time.perf_counter() - start)
+        if low_memory is not None:
+            release_pages(reader)
+            check_memory(low_memory, f"after extracting page {i + 1}")
+            text_chars += len(page_texts[-1])
+            if text_chars >= low_memory.max_text_chars:
+                if notes is not None:
+                    notes.append(f"stopped reading after page {i + 1}: the extracted text reached the "
+                                 f"low-memory cap of {low_memory.max_text_chars} characters")
+                break
+        if marker_seen:
+            break
+        marker_seen = streaming and boundary_is_settled(page_texts, strategies, threshold, normalizer)
+    return page_texts
+
+def extract_document(pdf_path, streaming=False, strategies=None, threshold=0.7, normalizer="compact",
+                     time_budget=None, page_timeout=None, cache_path=None, cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+                     low_memory=None):
+    """
+    Extract text from a PDF until the section marker and report how it went.
+
+    pdf_path may also be the PDF's bytes or a binary file-like object.
+    The result of a document cut at the marker carries its SectionIndex.
+    time_budget bounds the whole document in seconds and page_timeout each
+    page. A document that runs over its budget falls back to the cheap
+    strategies and, if those fail too, is reported with status "timeout".
+    With a page cache at cache_path, cached page texts are reused and the
+    PDF is only parsed if some page still has to be extracted. With
+    low_memory (MemoryLimits), a path is memory-mapped and pages are read
+    as described in extract_page_texts; a document that goes over the
+    memory ceiling is reported with status "error".
+    """
+    import PyPDF2
+
+    deadline = Deadline(time_budget)
+    notes = []
+    name = source_name(pdf_path) or "<bytes>"
+    metrics = FileMetrics("extract", name)
+    cache = open_cache(cache_path, cache_size_mb)
+    try:
+        with open_source(pdf_path, mapped=low_memory is not None) as file:
+            with metrics.timer("open"):
+                reader = cached_reader(cache, lambda: PyPDF2.PdfReader(file), lambda: source_hash(pdf_path, file))
+            try:
+                with metrics.timer("extract"):
+                    page_texts = extract_page_texts(reader, streaming, page_timeout, deadline, notes, metrics,
+                                                    low_memory, strategies, threshold, normalizer)
+                page_count = len(reader.pages)
+            finally:
+                save_cached_pages(reader)
+            metrics.bytes_read = file_size(file)
+        with metrics.timer("match"):
+            boundary = find_section_boundary(page_texts, strategies, threshold, normalizer, deadline, metrics)
+    except TimeBudgetExceeded as e:
+        notes.append(str(e))
+        return ExtractionResult(None, None, "timeout", "; ".join(notes), metrics.finish("timeout"))
+    except Exception as e:
+        print(f"Error processing {name}: {str(e)}")
+        return ExtractionResult("", None, "error", str(e), metrics.finish("error"))
+    finally:
+        if low_memory is not None:
+            release_memory()
+
+    reason = "; ".join(notes) or None
+    if boundary is None:
+        return ExtractionResult(None, None, "no-marker", reason, metrics.finish("no-marker"))
+    metrics.methods['boundary_strategy'] = boundary.strategy
+    return ExtractionResult(boundary.text, boundary.strategy, "ok", reason, metrics.finish("ok"),
+                            boundary.index._replace(page_count=page_count))
+
+def extract_text_until_section(pdf_path, streaming=False, strategies=None, threshold=0.7, normalizer="compact"):
+    """
+    Extract text from a PDF file until the section marker
+    "III. ADDITIONAL INFORMATION & SUPPORTING DOCUMENTS"
+
+    Returns None if no strategy finds the marker and "" if the PDF cannot be read.
+    """
+    return extract_document(pdf_path, streaming, strategies, threshold, normalizer).text
+
+def find_pdf_files(directory):
+    """Find all PDF files in a directory and its subdirectories."""
+    pdf_files = []
+    # Use Path.rglob for recursive glob pattern matching
+    for file_path in Path(directory).rglob("*.pdf"):
+        pdf_files.append(str(file_path))
+    return pdf_files
+
+def text_path_for(pdf_path, disclosure_dir, disclosure_text_dir, layout="mirror"):
+    """
+    Map a disclosure PDF to its text file.
+
+    "mirror" keeps the directory structure of the disclosure tree; "clean"
+    appends "-clean" to the top-level folder name (e.g. 20-T-009-clean/).
+    """
+    if layout == "mirror":
+        return pdf_path.replace(disclosure_dir, disclosure_text_dir).replace(".pdf", ".txt")
+    rel_path = os.path.relpath(pdf_path, disclosure_dir)
+    parts = Path(rel_path).parts
+    clean_parts = [p + "-clean" if i == 0 else p for i, p in enumerate(parts[:-1])]
+    clean_filename = Path(*clean_parts) / (Path(parts[-1]).stem + ".txt")
+    return str(Path(disclosure_text_dir) / clean_filename)
+
+def iter_extraction_results(pdf_files, workers=1, streaming=False, strategies=None, threshold=0.7,
+                            normalizer="compact", time_budget=None, page_timeout=None, cache_path=None,
+                            cache_size_mb=DEFAULT_CACHE_SIZE_MB, low_memory=None):
+    """Yield (pdf_path, ExtractionResult) pairs in input order, optionally using a process pool."""
+    extract = functools.partial(extract_document, streaming=streaming, strategies=strategies, threshold=threshold,
+                                normalizer=normalizer, time_budget=time_budget, page_timeout=page_timeout,
+                                cache_path=cache_path, cache_size_mb=cache_size_mb, low_memory=low_memory)
+    failed = ExtractionResult("", None, "error", "worker failed")
+    return imap_ordered(extract, pdf_files, workers, failed=failed)
+
+def index_columns(strategy, index):
+    """The row columns (as in TEXT_SCHEMA) of a boundary strategy and SectionIndex, which may be None."""
+    columns = {'strategy': strategy, **dict.fromkeys(SectionIndex._fields)}
+    if index is not None:
+        columns.update(index._asdict())
+    return columns
+
+def index_from_columns(columns):
+    """The SectionIndex in row columns made by index_columns, or None."""
+    if columns.get('page_count') is None:
+        return None
+    return SectionIndex(*(columns[field] for field in SectionIndex._fields))
+
+def previous_extraction(outputs, details=None):
+    """
+    Rebuild the ExtractionResult of an unchanged PDF from the text file recorded in the manifest.
+
+    details are the manifest details of the PDF, which hold its strategy and SectionIndex.
+    """
+    if not outputs:
+        return ExtractionResult(None, None, "no-marker", None)
+    details = details or {}
+    with open(outputs[0], 'r', encoding='utf-8') as f:
+        return ExtractionResult(f.read(), details.get('strategy'), "ok", None, None, index_from_columns(details))
+
+def process_pdfs(disclosure_dir, disclosure_text_dir, output_dir, workers=1, streaming=False, manifest_path=None,
+                 row_group_size=500, strategies=None, threshold=0.7, normalizer="compact", layout="mirror",
+                 time_budget=None, page_timeout=None, report_path=None, prometheus_path=None, cache_path=None,
+                 cache_size_mb=DEFAULT_CACHE_SIZE_MB, dedup=False, resume=False,
+                 checkpoint_interval=CHECKPOINT_SECONDS, low_memory=None):
+    """
+    Process PDFs, extract text before the section marker and stream the rows to
+    all_extracted_texts.parquet.
+
+    Each row with text carries the section index of its document (see
+    SectionIndex), which the manifest keeps for PDFs that are skipped as
+    unchanged. Documents that ran out of time are written as rows with
+    status "timeout" and no text. Per-file metrics go to the run report at report_path and run
+    totals to the Prometheus textfile at prometheus_path. Page texts are
+    shared through the page cache at cache_path. With dedup, PDFs with the
+    same content are extracted once, every copy still gets its row and text
+    file, and duplicates.parquet maps each copy to the PDF that was
+    extracted. Finished PDFs are checkpointed (see open_manifest); with
+    resume, the PDFs an interrupted run finished are not extracted again.
+    low_memory (MemoryLimits) turns on low-memory mode (see extract_document).
+    Returns the number of rows written and the first few text filenames.
+    """
+    from tqdm import tqdm
+    from disclosure_cleanup.parquet_writer import ParquetRowWriter
+
+    print(f"Starting content extraction from {disclosure_dir}...")
+
+    # Create output directories
+    os.makedirs(disclosure_text_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Get all PDF files in disclosure directory and subdirectories
+    pdf_files = find_pdf_files(disclosure_dir)
+
+    print(f"Found {len(pdf_files)} PDF files")
+
+    # Reuse the text files of unchanged PDFs (in incremental mode) and of PDFs done before an interruption
+    manifest, is_checkpoint = open_manifest(manifest_path, checkpoint_path(output_dir, "extract"), resume,
+                                            checkpoint_interval)
+    removed = manifest.remove_stale(pdf_files)
+    if removed:
+        print(f"Removed outputs of {len(removed)} deleted files")
+    pending_files = [pdf_path for pdf_path in pdf_files if not manifest.is_current(pdf_path)]
+    if len(pending_files) < len(pdf_files):
+        print(f"Skipping {len(pdf_files) - len(pending_files)} files that are already done")
+    pending = set(pending_files)
+
+    # Files with the same content as an unchanged file reuse its text
+    duplicates = {}
+    if dedup:
+        current = [pdf_path for pdf_path in pdf_files if pdf_path not in pending]
+        duplicates = find_duplicates(pdf_files, {path: manifest.recorded_hash(path) for path in current},
+                                     current, workers)
+        print_duplicate_summary(duplicates)
+        write_duplicates_table(os.path.join(output_dir, DUPLICATES_TABLE), duplicates, pdf_files)
+    extracted = {}
+
+    sample_filenames = []
+    timeout_count = 0
+    parquet_path = os.path.join(output_dir, "all_extracted_texts.parquet")
+
+    # Results arrive in the same order as pending_files, which keeps the rows in PDF file order
+    to_extract = [pdf_path for pdf_path in pending_files if original_of(duplicates, pdf_path) is None]
+    results = iter_extraction_results(to_extract, workers, streaming, strategies, threshold, normalizer, time_budget,
+                                      page_timeout, cache_path, cache_size_mb, low_memory)
+    report = RunReport(report_path, prometheus_path)
+    try:
+        with ParquetRowWriter(parquet_path, row_group_size=row_group_size) as writer, \
+                tqdm(total=len(pending_files), desc="Extracting content", unit="file") as progress:
+            for pdf_path in pdf_files:
+                if pdf_path not in pending:
+                    for txt_filename in manifest.outputs(pdf_path):
+                        with open(txt_filename, 'r', encoding='utf-8') as f:
+                            writer.write({'filename': txt_filename, 'text': f.read(), 'status': "ok",
+                                          **manifest.details(pdf_path)})
+                        if len(sample_filenames) < 5:
+                            sample_filenames.append(txt_filename)
+                    continue
+
+                original = original_of(duplicates, pdf_path)
+                if original is not None:
+                    # Same content as another file: reuse its text instead of extracting it again
+                    result = extracted.get(original) or previous_extraction(manifest.outputs(original),
+                                                                            manifest.details(original))
+                    metrics = FileMetrics("extract", pdf_path)
+                    metrics.methods['boundary_strategy'] = result.strategy
+                    metrics.methods['dedup'] = "duplicate"
+                    metrics.finish(result.status)
+                else:
+                    _, result = next(results)
+                    if pdf_path in duplicates:
+                        extracted[pdf_path] = result
+                    metrics = result.metrics or FileMetrics("extract", pdf_path).finish(result.status)
+                progress.update()
+                text = result.text
+                txt_filename = text_path_for(pdf_path, disclosure_dir, disclosure_text_dir, layout)
+
+                if result.status == "timeout":
+                    timeout_count += 1
+                    writer.write({'filename': txt_filename, 'text': None, 'status': result.status,
+                                  'reason': result.reason})
+
+                if text:
+                    writer.write({'filename': txt_filename, 'text': text, 'status': result.status,
+                                  'reason': result.reason, **index_columns(result.strategy, result.index)})
+                    if len(sample_filenames) < 5:
+                        sample_filenames.append(txt_filename)
+
+                    # Ensure the directory exists for the text file
+                    os.makedirs(os.path.dirname(txt_filename), exist_ok=True)
+                    with metrics.timer("write"), atomic_write(txt_filename, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                        metrics.bytes_written += f.tell()
+                report.add(metrics)
+
+                # Files that failed or timed out are left out of the manifest so they are retried next run
+                if result.status in ("ok", "no-marker"):
+                    digest = duplicates[pdf_path].content_hash if pdf_path in duplicates else None
+                    details = index_columns(result.strategy, result.index) if result.index else None
+                    manifest.record(pdf_path, [txt_filename] if text else [], digest, details)
+    finally:
+        results.close()
+        report.close()
+        manifest.save()
+    if is_checkpoint:
+        manifest.discard()
+
+    print(f"Extracted content from {writer.rows_written - timeout_count} files")
+    if timeout_count:
+        print(f"Timed out on {timeout_count} files")
+    return writer.rows_written, sample_filenames
+
+def add_extraction_arguments(parser, default_strategies=None, default_threshold=0.7, default_normalizer="compact",
+                             default_layout="mirror"):
+    """Add the options shared by the 01-extract-content scripts to an argparse parser."""
+    parser.add_argument("--disclosure-dir", default="data/invention_disclosure", help="Directory containing disclosure forms")
+    parser.add_argument("--disclosure-text-dir", default="data/invention_disclosure_txt", help="Directory to save extracted text files")
+    parser.add_argument("--output-dir", default="data", help="Directory to save output parquet and CSV files")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes for text extraction")
+    parser.add_argument("--streaming", action="store_true",
+                       help="Extract pages one at a time and stop reading once the section marker is found")
+    parser.add_argument("--manifest", default=None,
+                       help="Manifest file for incremental runs; unchanged PDFs are skipped")
+    parser.add_argument("--row-group-size", type=int, default=500,
+                       help="Number of documents per parquet row group")
+    parser.add_argument("--strategies", type=parse_strategy_list, default=default_strategies,
+                       help="Comma-separated boundary strategies to use, run cheapest-first "
+                            f"(available: {', '.join(STRATEGIES)}; default: all)")
+    parser.add_argument("--threshold", type=float, default=default_threshold,
+                       help="Similarity threshold for the fuzzy strategies")
+    parser.add_argument("--normalizer", choices=list(NORMALIZERS), default=default_normalizer,
+                       help="Text normalization used for marker matching")
+    parser.add_argument("--layout", choices=TEXT_LAYOUTS, default=default_layout,
+                       help="Layout of the text output tree")
+    add_dedup_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_budget_arguments(parser)
+    add_report_arguments(parser)
+    add_cache_arguments(parser)
+    add_memory_arguments(parser)
+    return parser
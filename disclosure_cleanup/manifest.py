@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import hashlib
+from disclosure_cleanup.atomic import atomic_write
+
+MANIFEST_VERSION = 1
+
+# Seconds between saves of a manifest while a run records files in it
+CHECKPOINT_SECONDS = 60
+
+def new_digest():
+    """Create the hash object used for content hashes."""
+    return hashlib.blake2b(digest_size=20)
+
+def hash_bytes(content):
+    """Hash in-memory content the same way content_hash hashes a file."""
+    digest = new_digest()
+    digest.update(content)
+    return digest.hexdigest()
+
+def content_hash(path, chunk_size=1 << 20):
+    """Hash a file's content with BLAKE2b, reading it in chunks."""
+    digest = new_digest()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Manifest:
+    """
+    Persistent record of the inputs a stage has processed and the outputs each produced.
+
+    Entries are keyed by input path and store the file's size, mtime and
+    content hash. An input whose size and mtime are unchanged is trusted
+    without rehashing; otherwise it is rehashed and only counts as changed
+    if the content differs. The manifest is a JSON file that is rewritten
+    atomically on save, and also every checkpoint_interval seconds while
+    files are being recorded, so a run that is killed outright only loses
+    the files of its last interval.
+
+    Without hash_inputs, inputs are not hashed just to be recorded: an
+    entry keeps only a hash it was given, and an input whose size or mtime
+    changed counts as changed unless the entry has one.
+    """
+
+    def __init__(self, path, checkpoint_interval=CHECKPOINT_SECONDS, hash_inputs=True):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.hash_inputs = hash_inputs
+        self.saved_at = time.monotonic()
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.entries = data.get('entries', {})
+
+    def is_current(self, input_path):
+        """Check whether input_path was already processed and all its outputs still exist."""
+        entry = self.entries.get(input_path)
+        if entry is None:
+            return False
+        if not all(os.path.exists(output) for output in entry['outputs']):
+            return False
+
+        stat = os.stat(input_path)
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        if stat.st_size != entry['size'] or not entry['hash']:
+            return False
+
+        # Same size but touched: only rehash to tell whether the content changed
+        if content_hash(input_path) != entry['hash']:
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def outputs(self, input_path):
+        """Return the outputs recorded for input_path."""
+        entry = self.entries.get(input_path)
+        return list(entry['outputs']) if entry else []
+
+    def recorded_hash(self, input_path):
+        """Return the content hash recorded for input_path, or None; only trust it while is_current holds."""
+        entry = self.entries.get(input_path)
+        return entry['hash'] if entry else None
+
+    def details(self, input_path):
+        """Return the details recorded for input_path (a dict, empty if there are none)."""
+        entry = self.entries.get(input_path)
+        return dict(entry.get('details') or {}) if entry else {}
+
+    def record(self, input_path, outputs, digest=None, details=None):
+        """
+        Record that input_path has been processed and produced outputs.
+
+        details is a JSON-serializable dict kept with the entry (e.g. the
+        section index of the text extracted from it). Outputs from a previous
+        run of the same input that were not produced again are deleted.
+        """
+        outputs = [str(output) for output in outputs]
+        for output in self.outputs(input_path):
+            if output not in outputs and os.path.exists(output):
+                os.remove(output)
+
+        stat = os.stat(input_path)
+        self.entries[input_path] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': digest or (content_hash(input_path) if self.hash_inputs else None),
+            'outputs': outputs,
+        }
+        if details:
+            self.entries[input_path]['details'] = details
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Save the manifest if checkpoint_interval seconds have passed since it was last saved."""
+        if self.path and self.checkpoint_interval is not None and \
+                time.monotonic() - self.saved_at >= self.checkpoint_interval:
+            self.save()
+
+    def remove_stale(self, current_inputs, under=None):
+        """
+        Drop entries for inputs that no longer exist and delete their outputs.
+
+        With `under`, only entries for inputs in that directory (or that
+        file) are considered. Returns the list of removed input paths.
+        """
+        current_inputs = set(current_inputs)
+        removed = [path for path in self.entries if path not in current_inputs
+                   and (under is None or path == under or path.startswith(os.path.join(under, "")))]
+        for path in removed:
+            for output in self.entries.pop(path)['outputs']:
+                if os.path.exists(output):
+                    os.remove(output)
+        return removed
+
+    def save(self):
+        """Write the manifest to disk, replacing the previous version atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with atomic_write(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'entries': self.entries}, f, indent=1, sort_keys=True)
+        self.saved_at = time.monotonic()
+
+    def discard(self):
+        """Delete the manifest file."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def checkpoint_path(directory, stage):
+    """Where a run of stage without a manifest keeps its checkpoint: a hidden file in its output directory."""
+    return os.path.join(directory, f".{stage}-checkpoint.json")
+
+def open_manifest(manifest_path, checkpoint, resume=False, checkpoint_interval=CHECKPOINT_SECONDS):
+    """
+    Open the manifest a run records its finished inputs in; returns (manifest, whether it is a checkpoint).
+
+    With manifest_path, that manifest is used: it is saved periodically,
+    so an interrupted run always carries on where it stopped. Otherwise the
+    run records its progress in a checkpoint at the path `checkpoint`. With
+    resume, the run continues from the checkpoint an interrupted run left
+    there; without it, the run starts over. The caller deletes the
+    checkpoint once the run completes. A checkpoint only lives as long as
+    the run, so it does not hash inputs that were not hashed anyway.
+    """
+    if manifest_path:
+        return Manifest(manifest_path, checkpoint_interval), False
+
+    manifest = Manifest(checkpoint if resume else None, checkpoint_interval, hash_inputs=False)
+    if resume:
+        if manifest.entries:
+            print(f"Resuming from {checkpoint}: {len(manifest.entries)} files were already done")
+        else:
+            print(f"No checkpoint at {checkpoint}; starting from the beginning")
+    manifest.path = checkpoint
+    return manifest, True
+
+def add_checkpoint_arguments(parser):
+    """Add the checkpoint and resume options to an argparse parser."""
+    parser.add_argument("--resume", action="store_true",
+                       help="Continue an interrupted run from its checkpoint instead of starting over "
+                            "(runs with --manifest always carry on where they stopped)")
+    parser.add_argument("--checkpoint-interval", type=float, default=CHECKPOINT_SECONDS,
+                       help="Seconds between checkpoints of the finished files")
+    return parser
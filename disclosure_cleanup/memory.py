@@ -0,0 +1,138 @@
+"""
+Low-memory mode for very large PDFs (e.g. disclosures bundled with hundreds of pages of scanned appendices).
+
+In low-memory mode a PDF given as a path is read through a read-only
+memory map instead of being loaded into memory, so its bytes stay in the
+OS page cache, where the kernel can drop them. The objects PyPDF2 parses
+and caches for a page (content streams in particular, which it keeps
+decoded) are released once the page's text is extracted. Extracted text
+is capped: extraction stops reading pages once the cap is reached, and the
+desensitizer only keeps page texts up to the cap, extracting later pages
+again when it needs them. After each document the worker hands freed
+memory back to the OS.
+
+A memory ceiling can be set per worker. It is checked after every page
+against the process's resident memory that is not backed by a file (pages
+of the mapped PDF can be dropped by the kernel, so they do not count). A
+document that takes a worker over the ceiling is abandoned with
+MemoryLimitExceeded and, like a document that fails, retried on the next
+run, rather than getting the worker killed by the OOM killer. The check
+is made between pages, so a single page can still overshoot it.
+"""
+import gc
+import os
+import sys
+import mmap
+from collections import namedtuple
+from contextlib import contextmanager
+from disclosure_cleanup.page_cache import CachedReader
+
+DEFAULT_MAX_TEXT_MB = 16
+
+# Limits of low-memory mode: extracted text held per document, in characters, and the
+# per-worker memory ceiling in MB (None for no ceiling)
+MemoryLimits = namedtuple("MemoryLimits", ["max_text_chars", "max_rss_mb"],
+                          defaults=[DEFAULT_MAX_TEXT_MB << 20, None])
+
+class MemoryLimitExceeded(MemoryError):
+    """Raised when a worker goes over its memory ceiling while processing a document."""
+
+class MappedFile(mmap.mmap):
+    """A read-only memory map of a file that can stand in for the file itself (e.g. for PdfReader)."""
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        # mmap.seek returns None before Python 3.13; file objects return the new position
+        super().seek(pos, whence)
+        return self.tell()
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+@contextmanager
+def mapped_content(path):
+    """
+    Yield the content of the file at path as a MappedFile, or as b"" if it is empty (which cannot be mapped).
+
+    Like bytes, a MappedFile can be hashed, written out and sliced.
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = MappedFile(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapped
+    finally:
+        mapped.close()
+
+def private_memory():
+    """
+    Resident memory of this process that is not backed by a file, in bytes, or None if it is unknown.
+
+    Read from /proc; elsewhere the peak resident set size is used instead.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            fields = f.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def check_memory(limits, what):
+    """Raise MemoryLimitExceeded if limits has a memory ceiling and this process is over it."""
+    if limits is None or limits.max_rss_mb is None:
+        return
+    used = private_memory()
+    if used is not None and used > limits.max_rss_mb * (1 << 20):
+        raise MemoryLimitExceeded(f"memory ceiling of {limits.max_rss_mb:g} MB exceeded {what} "
+                                  f"({used / (1 << 20):.0f} MB in use)")
+
+def release_pages(reader):
+    """
+    Drop the objects PyPDF2 has parsed from an opened PDF so far; they are parsed again if they are needed.
+
+    reader may be a CachedReader, whose PDF is left alone if it has not been parsed.
+    """
+    if isinstance(reader, CachedReader):
+        reader = vars(reader).get("reader")
+    resolved_objects = getattr(reader, "resolved_objects", None)
+    if resolved_objects:
+        resolved_objects.clear()
+
+def release_memory():
+    """Collect garbage and hand freed heap memory back to the OS (with glibc), so it does not pile up in a worker."""
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        import ctypes
+
+        try:
+            ctypes.CDLL(None).malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+def memory_limits(args):
+    """The MemoryLimits selected by the options of add_memory_arguments, or None if low-memory mode is off."""
+    if not args.low_memory and args.max_rss_mb is None:
+        return None
+    return MemoryLimits(int(args.max_text_mb * (1 << 20)), args.max_rss_mb)
+
+def add_memory_arguments(parser):
+    """Add the low-memory mode options to an argparse parser."""
+    parser.add_argument("--low-memory", action="store_true",
+                       help="Memory-map PDFs, release parsed pages once processed and cap the extracted text held")
+    parser.add_argument("--max-text-mb", type=float, default=DEFAULT_MAX_TEXT_MB,
+                       help="Extracted text held per document in low-memory mode, in MB (counted in characters)")
+    parser.add_argument("--max-rss-mb", type=float, default=None,
+                       help="Memory ceiling per worker in MB; a document that exceeds it is abandoned and retried "
+                            "next run (implies --low-memory)")
+    return parser
@@ -0,0 +1,194 @@
+"""
+Run instrumentation: per-file timings, bytes and memory use.
+
+Each stage fills in one FileMetrics per input file (in whichever worker
+process handled it) and hands it back to the parent. The parent adds it to
+a RunReport, which writes one row per file to a JSONL or Parquet file and,
+optionally, run totals to a Prometheus textfile for node_exporter.
+"""
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from disclosure_cleanup.atomic import atomic_write
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Phases timed for each file; each becomes a <phase>_seconds column in the report
+PHASES = ["open", "extract", "match", "write"]
+
+# Which method decided the outcome of a file, per stage
+METHOD_KINDS = ["classify_method", "link_mode", "boundary_strategy", "marker_method", "dedup"]
+
+def peak_rss_bytes():
+    """Peak resident set size of the current process in bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class FileMetrics:
+    """Timings and counters for one input file in one stage."""
+
+    def __init__(self, stage, path):
+        self.stage = stage
+        self.path = str(path)
+        self.status = None
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.timings = {}
+        self.page_seconds = []
+        self.strategy_seconds = {}
+        self.methods = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_rss = None
+
+    @contextmanager
+    def timer(self, phase):
+        """Add the time spent in the enclosed block to `phase`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+    def finish(self, status=None):
+        """Stop the clock and sample the peak RSS of this process."""
+        if status is not None:
+            self.status = status
+        self.seconds = time.perf_counter() - self.started
+        self.peak_rss = peak_rss_bytes()
+        return self
+
+    def as_row(self):
+        """Flat report row; strategy timings are a JSON object keyed by strategy name."""
+        row = {'stage': self.stage, 'path': self.path, 'status': self.status, 'seconds': self.seconds}
+        for phase in PHASES:
+            row[f"{phase}_seconds"] = self.timings.get(phase)
+        row['pages'] = len(self.page_seconds)
+        row['slowest_page_seconds'] = max(self.page_seconds, default=None)
+        for kind in METHOD_KINDS:
+            row[kind] = self.methods.get(kind)
+        row['strategy_seconds'] = json.dumps(self.strategy_seconds) if self.strategy_seconds else None
+        row['bytes_read'] = self.bytes_read
+        row['bytes_written'] = self.bytes_written
+        row['peak_rss_bytes'] = self.peak_rss
+        return row
+
+def escape_label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class RunReport:
+    """
+    Collect FileMetrics for a run and write the report files.
+
+    With a path ending in .parquet the rows are written when the report is
+    closed; any other path is written as JSONL as the rows arrive. With
+    neither path the report only keeps the totals, which costs next to
+    nothing.
+    """
+
+    def __init__(self, path=None, prometheus_path=None):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.started = time.time()
+        self.rows = []
+        self.totals = {}
+        self.file = None
+        if path and not path.endswith(".parquet"):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.file = open(path, "w", encoding="utf-8")
+
+    def add(self, metrics):
+        """Record the metrics of one file."""
+        if metrics.seconds is None:
+            metrics.finish()
+        row = metrics.as_row()
+        if self.file is not None:
+            self.file.write(json.dumps(row) + "\n")
+            self.file.flush()
+        elif self.path:
+            self.rows.append(row)
+        self.update_totals(metrics)
+
+    def count(self, name, labels, value=1):
+        """Add value to the total `name` with the given labels."""
+        key = (name, tuple(sorted(labels.items())))
+        self.totals[key] = self.totals.get(key, 0) + value
+
+    def update_totals(self, metrics):
+        """Fold one file into the run totals exported to Prometheus."""
+        stage = {'stage': metrics.stage}
+        self.count("files_total", dict(stage, status=metrics.status or "unknown"))
+        self.count("file_seconds_total", stage, metrics.seconds)
+        for phase, seconds in metrics.timings.items():
+            self.count("phase_seconds_total", dict(stage, phase=phase), seconds)
+        self.count("pages_total", stage, len(metrics.page_seconds))
+        for strategy, seconds in metrics.strategy_seconds.items():
+            self.count("strategy_seconds_total", dict(stage, strategy=strategy), seconds)
+        for kind, method in metrics.methods.items():
+            if method is not None:
+                self.count("method_total", dict(stage, kind=kind, method=method))
+        self.count("bytes_read_total", stage, metrics.bytes_read)
+        self.count("bytes_written_total", stage, metrics.bytes_written)
+        if metrics.peak_rss is not None:
+            key = ("peak_rss_bytes", tuple(stage.items()))
+            self.totals[key] = max(self.totals.get(key, 0), metrics.peak_rss)
+
+    def prometheus_text(self):
+        """The run totals in the Prometheus text exposition format."""
+        self.totals[("run_seconds", ())] = time.time() - self.started
+        self.totals[("last_run_timestamp_seconds", ())] = time.time()
+        lines = []
+        for name in sorted({name for name, _ in self.totals}):
+            metric = f"disclosure_{name}"
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {metric} {kind}")
+            for (key_name, labels), value in sorted(self.totals.items()):
+                if key_name != name:
+                    continue
+                label_text = ",".join(f'{k}="{escape_label(v)}"' for k, v in labels)
+                value_text = str(value) if isinstance(value, int) else repr(float(value))
+                lines.append(f"{metric}{{{label_text}}} {value_text}" if label_text else f"{metric} {value_text}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        """Write the run totals as a Prometheus textfile, atomically so a scrape never sees half a file."""
+        text = self.prometheus_text()
+        os.makedirs(os.path.dirname(self.prometheus_path) or ".", exist_ok=True)
+        with atomic_write(self.prometheus_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def close(self):
+        """Write out the report files."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        elif self.path:
+            import pandas as pd
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            pd.DataFrame(self.rows).to_parquet(self.path, index=False)
+        if self.prometheus_path:
+            self.write_prometheus()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def add_report_arguments(parser):
+    """Add the run report options to an argparse parser."""
+    parser.add_argument("--report", default=None,
+                       help="Write per-file timings, bytes and peak RSS to this file (.jsonl or .parquet)")
+    parser.add_argument("--prometheus-textfile", default=None,
+                       help="Write run totals to this Prometheus textfile (for the node_exporter textfile collector)")
+    return parser
@@ -0,0 +1,226 @@
+"""
+Persistent cache of extracted page text shared by the extraction and desensitization stages.
+
+Page text is keyed by the PDF's content hash, the page index and the
+extractor version, so a page is only text-extracted once no matter which
+stage or run asks for it. Moving or renaming a PDF keeps its cache entries;
+upgrading PyPDF2 invalidates them. The cache is a single SQLite file in WAL
+mode, which lets the worker processes of a run read and write it
+concurrently. Once it grows past its size limit, the least recently used
+documents are evicted.
+
+The same file also remembers how the select stage classified each PDF.
+Those entries are keyed by path, size and mtime instead, because hashing a
+file would mean reading all of it, and the classifier only reads the first
+page.
+"""
+import os
+import time
+import sqlite3
+import functools
+
+# Bump when the way page text is produced changes
+EXTRACTOR_REVISION = 1
+
+DEFAULT_CACHE_SIZE_MB = 2048
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    pdf_hash TEXT NOT NULL,
+    version TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (pdf_hash, version)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    pdf_hash TEXT NOT NULL,
+    version TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (pdf_hash, version, page)
+);
+CREATE INDEX IF NOT EXISTS documents_last_used ON documents (last_used);
+CREATE TABLE IF NOT EXISTS classifications (
+    path TEXT NOT NULL,
+    version TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    is_invention INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    PRIMARY KEY (path, version)
+);
+"""
+
+@functools.lru_cache(maxsize=None)
+def extractor_version():
+    """Version tag stored with every cached page; PyPDF2 is only imported once a cache is opened."""
+    import PyPDF2
+
+    return f"PyPDF2-{PyPDF2.__version__}/{EXTRACTOR_REVISION}"
+
+class PageTextCache:
+    """SQLite store of page texts keyed by (PDF content hash, page index, extractor version)."""
+
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_SIZE_MB << 20, version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version or extractor_version()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def load(self, pdf_hash):
+        """Return (page count, {page index: text}) for a PDF, or (None, {}) if it was never cached."""
+        row = self.conn.execute("SELECT page_count FROM documents WHERE pdf_hash = ? AND version = ?",
+                                (pdf_hash, self.version)).fetchone()
+        if row is None:
+            return None, {}
+        with self.conn:
+            self.conn.execute("UPDATE documents SET last_used = ? WHERE pdf_hash = ? AND version = ?",
+                              (time.time(), pdf_hash, self.version))
+        texts = dict(self.conn.execute("SELECT page, text FROM pages WHERE pdf_hash = ? AND version = ?",
+                                       (pdf_hash, self.version)))
+        return row[0], texts
+
+    def store(self, pdf_hash, page_count, texts):
+        """Add the page texts {page index: text} of a PDF, then evict old documents if over the size limit."""
+        with self.conn:
+            self.conn.execute("INSERT INTO documents (pdf_hash, version, page_count, size, last_used) "
+                              "VALUES (?, ?, ?, 0, ?) ON CONFLICT (pdf_hash, version) "
+                              "DO UPDATE SET last_used = excluded.last_used",
+                              (pdf_hash, self.version, page_count, time.time()))
+            # Another worker may have stored some of the same pages already; only count what is new
+            size = 0
+            for page, text in texts.items():
+                cursor = self.conn.execute("INSERT OR IGNORE INTO pages (pdf_hash, version, page, text) "
+                                           "VALUES (?, ?, ?, ?)", (pdf_hash, self.version, page, text))
+                if cursor.rowcount:
+                    size += len(text.encode("utf-8"))
+            self.conn.execute("UPDATE documents SET size = size + ? WHERE pdf_hash = ? AND version = ?",
+                              (size, pdf_hash, self.version))
+        self.evict()
+
+    def load_classification(self, path, size, mtime_ns, revision):
+        """Return the cached (is_invention, method) of a file, or None if it changed or was never classified."""
+        row = self.conn.execute("SELECT is_invention, method FROM classifications "
+                                "WHERE path = ? AND version = ? AND size = ? AND mtime_ns = ?",
+                                (path, f"{self.version}/{revision}", size, mtime_ns)).fetchone()
+        return None if row is None else (bool(row[0]), row[1])
+
+    def store_classification(self, path, size, mtime_ns, revision, is_invention, method):
+        """Remember how a file was classified; the entry is only used while its size and mtime are unchanged."""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO classifications "
+                              "(path, version, size, mtime_ns, is_invention, method) VALUES (?, ?, ?, ?, ?, ?)",
+                              (path, f"{self.version}/{revision}", size, mtime_ns, int(is_invention), method))
+
+    def total_size(self):
+        """Bytes of page text currently cached."""
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used documents until the cache fits in max_bytes."""
+        excess = self.total_size() - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for pdf_hash, version, size in self.conn.execute(
+                "SELECT pdf_hash, version, size FROM documents ORDER BY last_used"):
+            victims.append((pdf_hash, version))
+            excess -= size
+            if excess <= 0:
+                break
+        with self.conn:
+            self.conn.executemany("DELETE FROM pages WHERE pdf_hash = ? AND version = ?", victims)
+            self.conn.executemany("DELETE FROM documents WHERE pdf_hash = ? AND version = ?", victims)
+
+    def close(self):
+        self.conn.close()
+
+@functools.lru_cache(maxsize=None)
+def _open_cache(path, max_bytes, pid):
+    return PageTextCache(path, max_bytes)
+
+def open_cache(path, max_mb=DEFAULT_CACHE_SIZE_MB):
+    """
+    Open the page cache at path, or return None if path is None.
+
+    Connections are reused within a process; worker processes forked from a
+    parent that already had the cache open get a connection of their own.
+    """
+    if path is None:
+        return None
+    return _open_cache(path, int(max_mb * (1 << 20)), os.getpid())
+
+class CachedPage:
+    """A page whose extract_text() is answered from the cache when possible."""
+
+    def __init__(self, owner, index):
+        self.owner = owner
+        self.index = index
+
+    def extract_text(self):
+        texts = self.owner.texts
+        if self.index not in texts:
+            # Only successful extractions are cached; timeouts and errors propagate uncached
+            texts[self.index] = self.owner.reader.pages[self.index].extract_text()
+            self.owner.new_pages.add(self.index)
+        return texts[self.index]
+
+class CachedReader:
+    """
+    Stand-in for a PdfReader that serves page text from a PageTextCache.
+
+    Only `pages[i].extract_text()` goes through the cache; the PDF itself is
+    parsed (through open_reader) the first time a page is missing or the page
+    count is unknown, and `reader` gives access to the real PdfReader. Call
+    save() once done to store the newly extracted pages.
+    """
+
+    def __init__(self, cache, pdf_hash, open_reader):
+        self.cache = cache
+        self.pdf_hash = pdf_hash
+        self.open_reader = open_reader
+        self.page_count, self.texts = cache.load(pdf_hash)
+        self.new_pages = set()
+
+    @functools.cached_property
+    def reader(self):
+        return self.open_reader()
+
+    @functools.cached_property
+    def pages(self):
+        count = self.page_count if self.page_count is not None else len(self.reader.pages)
+        return [CachedPage(self, i) for i in range(count)]
+
+    def save(self):
+        """Store the pages extracted since the cache was read."""
+        if self.new_pages:
+            self.cache.store(self.pdf_hash, len(self.pages), {i: self.texts[i] for i in self.new_pages})
+            self.new_pages.clear()
+
+def cached_reader(cache, open_reader, get_hash):
+    """Wrap a PDF in a CachedReader, or just open it if there is no cache; get_hash is only called with a cache."""
+    if cache is None:
+        return open_reader()
+    return CachedReader(cache, get_hash(), open_reader)
+
+def real_reader(reader):
+    """The PdfReader behind a reader that may be a CachedReader."""
+    return reader.reader if isinstance(reader, CachedReader) else reader
+
+def save_cached_pages(reader):
+    """Store newly extracted pages if reader is a CachedReader."""
+    if isinstance(reader, CachedReader):
+        reader.save()
+
+def add_cache_arguments(parser):
+    """Add the page text cache options to an argparse parser."""
+    parser.add_argument("--page-cache", default=None,
+                       help="SQLite file caching extracted page text across stages and runs")
+    parser.add_argument("--page-cache-size", type=float, default=DEFAULT_CACHE_SIZE_MB,
+                       help="Size limit of the page cache in MB; least recently used documents are evicted")
+    return parser
@@ -0,0 +1,167 @@
+from collections import deque
+
+def finished_before_break(future):
+    """Whether a future of a pool that broke had finished (successfully or with an ordinary error) before it did."""
+    from concurrent.futures.process import BrokenProcessPool
+
+    return future.done() and not future.cancelled() and not isinstance(future.exception(), BrokenProcessPool)
+
+def submit(executor, func, item):
+    """Submit func(item) to executor; a pool that has already broken gives a future failing with BrokenProcessPool."""
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+
+    try:
+        return executor.submit(func, item)
+    except BrokenProcessPool as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+
+def future_result(item, future, failed):
+    """The result of a finished future, or `failed` if its call raised."""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Error processing {item}: {str(e)}")
+        return failed
+
+def isolate(func, items, failed):
+    """
+    Yield (item, func(item)) pairs, running the items one at a time in a single-worker pool.
+
+    Used after a worker died: only the item a worker dies on yields `failed`
+    (the pool is then restarted for the next one), so a crash is pinned on
+    the file that caused it rather than on whatever else was in flight.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    executor = ProcessPoolExecutor(max_workers=1)
+    try:
+        for item in items:
+            future = executor.submit(func, item)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                print(f"Error processing {item}: worker process died")
+                result = failed
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=1)
+            except Exception as e:
+                print(f"Error processing {item}: {str(e)}")
+                result = failed
+            yield item, result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def imap_ordered(func, items, workers=1, failed=None, max_in_flight=None):
+    """
+    Yield (item, func(item)) pairs in input order.
+
+    With more than one worker the calls are spread over a process pool.
+    At most a few tasks per worker (or max_in_flight) are in flight so
+    finished results do not pile up behind a slow item and items are only
+    read from the iterable as the pool needs them. Items whose call fails
+    yield `failed`. If a worker dies (e.g. PyPDF2 crashing the interpreter),
+    the whole pool goes down with the items in flight, and there is no
+    telling which of them killed it: the ones that had not finished are run
+    again one at a time (see isolate), so only the item that really crashes
+    a worker yields `failed`. Then a new pool takes over the rest.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    # Only imported here so single-process runs start faster
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    max_in_flight = max_in_flight or workers * 4
+    remaining = iter(items)
+    pending = deque()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            # Keep the pool fed up to the in-flight limit
+            while len(pending) < max_in_flight:
+                item = next(remaining, None)
+                if item is None:
+                    break
+                pending.append((item, submit(executor, func, item)))
+            if not pending:
+                break
+
+            item, future = pending.popleft()
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                executor.shutdown(wait=False, cancel_futures=True)
+                pending.appendleft((item, future))
+                print(f"A worker process died; running the {len(pending)} items in flight one at a time")
+                # Keep the results that came in before the pool broke, in order, and rerun the rest
+                while pending:
+                    item, future = pending.popleft()
+                    if finished_before_break(future):
+                        yield item, future_result(item, future, failed)
+                        continue
+                    suspects = [item]
+                    while pending and not finished_before_break(pending[0][1]):
+                        suspects.append(pending.popleft()[0])
+                    yield from isolate(func, suspects, failed)
+                executor = ProcessPoolExecutor(max_workers=workers)
+                continue
+            except Exception as e:
+                print(f"Error processing {item}: {str(e)}")
+                result = failed
+            yield item, result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def imap_unordered(func, items, workers=1, failed=None, max_in_flight=None):
+    """
+    Yield (item, func(item)) pairs as the calls finish.
+
+    Same pool handling as imap_ordered, but a slow item does not hold back
+    the results of the items submitted after it.
+    """
+    if workers <= 1:
+        yield from imap_ordered(func, items, workers, failed)
+        return
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    max_in_flight = max_in_flight or workers * 4
+    remaining = iter(items)
+    pending = {}
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            while len(pending) < max_in_flight:
+                item = next(remaining, None)
+                if item is None:
+                    break
+                pending[submit(executor, func, item)] = item
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if not all(finished_before_break(future) for future in done):
+                executor.shutdown(wait=False, cancel_futures=True)
+                print(f"A worker process died; running the {len(pending)} items in flight one at a time")
+                suspects = []
+                for future, item in pending.items():
+                    if finished_before_break(future):
+                        yield item, future_result(item, future, failed)
+                    else:
+                        suspects.append(item)
+                pending = {}
+                yield from isolate(func, suspects, failed)
+                executor = ProcessPoolExecutor(max_workers=workers)
+                continue
+            for future in done:
+                item = pending.pop(future)
+                yield item, future_result(item, future, failed)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,189 @@
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.parquet as pq
+from disclosure_cleanup.atomic import discard, remove_stale_temporaries, temporary_path
+
+# Suffix of the directory of finished parts a ParquetRowWriter keeps until it is closed
+PARTS_SUFFIX = ".parts"
+
+# Schema of all_extracted_texts.parquet. The columns after reason are the boundary strategy and the
+# section index of the document (see extraction.SectionIndex), null where there is none
+TEXT_SCHEMA = pa.schema([
+    ('filename', pa.string()),
+    ('text', pa.string()),
+    ('status', pa.string()),
+    ('reason', pa.string()),
+    ('strategy', pa.string()),
+    ('page_count', pa.int32()),
+    ('page_offsets', pa.list_(pa.int64())),
+    ('marker', pa.string()),
+    ('marker_page', pa.int32()),
+    ('marker_offset', pa.int64()),
+    ('score', pa.float64()),
+])
+
+# Schema of duplicates.parquet, which maps each copy of a shared PDF to the one that was processed
+DUPLICATES_SCHEMA = pa.schema([
+    ('path', pa.string()),
+    ('content_hash', pa.string()),
+    ('original', pa.string()),
+    ('size', pa.int64()),
+])
+
+class ParquetRowWriter:
+    """
+    Write rows to a Parquet file incrementally in fixed-size row groups.
+
+    Only the current row group is held in memory. The row groups go to a
+    hidden directory of complete part files next to path (see parts_dir),
+    starting a new part every part_row_groups row groups, so if the process
+    is killed outright (e.g. by the OOM killer) every part it finished can
+    still be read, as the Parquet dataset in that directory. Closing the
+    writer merges the parts into a temporary file that replaces path and
+    deletes the directory; until then the previous file at path stays in
+    place. Use it as a context manager: the writer is also closed when an
+    exception (including KeyboardInterrupt or SystemExit) is propagating.
+    """
+
+    def __init__(self, path, schema=TEXT_SCHEMA, row_group_size=500, part_row_groups=1):
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.part_row_groups = part_row_groups
+        self.rows_written = 0
+        self._buffer = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A writer killed outright cannot clean up after itself; its successor does
+        remove_stale_temporaries(path)
+        remove_stale_temporaries(path, PARTS_SUFFIX)
+        self.parts_dir = temporary_path(path, PARTS_SUFFIX)
+        os.makedirs(self.parts_dir)
+        self._parts = []
+        self._part_path = None
+        self._part_tmp_path = None
+        self._writer = None
+        self._row_groups = 0
+        self._closed = False
+
+    def write(self, row):
+        """Add a row (a dict keyed by column name), flushing a row group when the buffer is full."""
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one row group."""
+        if not self._buffer:
+            return
+        if self._writer is None:
+            name = f"part-{len(self._parts):05d}.parquet"
+            self._part_path = os.path.join(self.parts_dir, name)
+            # Readers of the directory skip hidden files, so a part only shows up once it has its footer
+            self._part_tmp_path = os.path.join(self.parts_dir, f".{name}.tmp")
+            self._writer = pq.ParquetWriter(self._part_tmp_path, self.schema)
+        table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+        self._row_groups += 1
+        if self._row_groups >= self.part_row_groups:
+            self._finish_part()
+
+    def _finish_part(self):
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        writer.close()
+        os.replace(self._part_tmp_path, self._part_path)
+        self._parts.append(self._part_path)
+        self._row_groups = 0
+
+    def close(self):
+        """Flush remaining rows and replace path with the merged parts."""
+        if self._closed:
+            return
+        self._closed = True
+        tmp_path = temporary_path(self.path)
+        try:
+            try:
+                self.flush()
+            finally:
+                self._finish_part()
+            with pq.ParquetWriter(tmp_path, self.schema) as writer:
+                for part in self._parts:
+                    # A part holds at most part_row_groups row groups
+                    writer.write_table(pq.read_table(part, schema=self.schema), row_group_size=self.row_group_size)
+            os.replace(tmp_path, self.path)
+            shutil.rmtree(self.parts_dir)
+        finally:
+            discard(tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class PartitionedRowWriter:
+    """
+    Write rows to a series of Parquet part files, one part at a time.
+
+    Call open_part(path) before the rows of each part; all rows of a part
+    must arrive together. A part is written to a hidden temporary file next
+    to it and only renamed into place once it is complete, so an existing
+    part is replaced in one step and a run that stops halfway leaves the
+    finished parts and no partial one. Every opened part is written, even
+    if it gets no rows.
+    """
+
+    def __init__(self, schema=TEXT_SCHEMA, row_group_size=500):
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self.path = None
+        self._writer = None
+
+    def open_part(self, path):
+        """Finish the current part and start writing to path (nothing happens if path is the current part)."""
+        if path == self.path:
+            return
+        self._finish(keep=True)
+        self.path = path
+        directory, name = os.path.split(path)
+        self._writer = ParquetRowWriter(os.path.join(directory, f".{name}.tmp"), self.schema, self.row_group_size)
+
+    def write(self, row):
+        """Add a row to the current part."""
+        self._writer.write(row)
+
+    def _finish(self, keep):
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        try:
+            writer.close()
+        except BaseException:
+            keep = False
+            raise
+        finally:
+            if keep:
+                os.replace(writer.path, self.path)
+                self.rows_written += writer.rows_written
+            elif os.path.exists(writer.path):
+                os.remove(writer.path)
+
+    def close(self):
+        """Finish the current part."""
+        self._finish(keep=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A part that was interrupted is incomplete: drop it rather than replace an older, complete one
+        self._finish(keep=exc_type is None)
+        return False
@@ -0,0 +1,37 @@
+"""
+The per-folder Parquet parts that sharded runs and watch mode write instead of all_extracted_texts.parquet.
+
+Each top-level entry of the raw directory (an XX-T-XXX folder, or a PDF
+directly in it) has a part of its own, all_extracted_texts.parts/<entry>.parquet
+in the output directory, which is replaced in one step whenever the entry is
+processed again. The merge command combines the parts into
+all_extracted_texts.parquet.
+"""
+import os
+from disclosure_cleanup.selection import find_pdf_files
+
+# Directory in the output directory holding one Parquet part per raw folder
+PARTS_DIR = "all_extracted_texts.parts"
+
+def top_level_entry(root, path):
+    """The top-level entry of root that path is in, or None for root itself."""
+    rel_path = os.path.relpath(path, root)
+    if rel_path == "." or rel_path.startswith(".."):
+        return None
+    return os.path.join(root, rel_path.split(os.sep)[0])
+
+def entry_pdf_files(entry):
+    """The PDF files in a top-level entry of the raw directory (a folder, or a PDF directly in it)."""
+    if os.path.isdir(entry):
+        return find_pdf_files(entry)
+    return [entry] if entry.endswith(".pdf") and os.path.isfile(entry) else []
+
+def find_folders(raw_dir):
+    """{top-level entry of raw_dir: the PDF files in it}, sorted by entry."""
+    folders = {}
+    for pdf_path in find_pdf_files(raw_dir):
+        folders.setdefault(top_level_entry(raw_dir, pdf_path), []).append(pdf_path)
+    return dict(sorted(folders.items()))
+
+def part_path(parts_dir, folder):
+    return os.path.join(parts_dir, f"{os.path.basename(folder)}.parquet")
@@ -0,0 +1,498 @@
+"""
+Single-pass pipeline: classify, extract and desensitize each raw PDF while reading and parsing it only once.
+"""
+import io
+import os
+import time
+import shutil
+import functools
+from contextlib import ExitStack
+from disclosure_cleanup.atomic import atomic_write
+from disclosure_cleanup.budget import Deadline, PageTimeout, TimeBudgetExceeded, add_budget_arguments, page_limit
+from disclosure_cleanup.dedup import (DUPLICATES_TABLE, add_dedup_arguments, find_duplicates, link_output,
+                                      original_of, print_duplicate_summary, write_duplicates_table)
+from disclosure_cleanup.desensitization import LazyPageTexts, desensitize_reader
+from disclosure_cleanup.extraction import (STRATEGIES, find_section_boundary, index_columns, index_from_columns,
+                                           parse_strategy_list)
+from disclosure_cleanup.manifest import CHECKPOINT_SECONDS, checkpoint_path, hash_bytes, open_manifest
+from disclosure_cleanup.memory import (add_memory_arguments, check_memory, mapped_content, release_memory,
+                                       release_pages)
+from disclosure_cleanup.metrics import FileMetrics, RunReport, add_report_arguments
+from disclosure_cleanup.page_cache import (DEFAULT_CACHE_SIZE_MB, add_cache_arguments, cached_reader, open_cache,
+                                           real_reader, save_cached_pages)
+from disclosure_cleanup.parallel import imap_ordered
+from disclosure_cleanup.selection import CLASSIFY_MODES, LINK_MODES, classify_pdf, find_pdf_files, place_file
+
+def process_raw_pdf(pdf_path, raw_dir, disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir,
+                    link_mode="copy", strategies=None, time_budget=None, page_timeout=None, cache_path=None,
+                    cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", low_memory=None):
+    """
+    Run all three stages on one raw PDF, reading and parsing it only once.
+
+    The file is opened once. Disclosure forms are read into memory a single
+    time, and the copy into the disclosure directory is written from those
+    bytes. They are parsed once, by a PdfReader that classification,
+    section extraction and desensitization share, so the page texts feed
+    both the section extraction and the desensitization.
+
+    If the document runs over time_budget seconds while its pages are being
+    extracted, neither text nor a desensitized PDF is written and the result
+    has status "timeout". Past the budget, the boundary search falls back to
+    the cheap strategies.
+
+    Page texts found in the page cache at cache_path are reused instead of
+    extracted. The result carries the FileMetrics of the file under 'metrics',
+    and the boundary strategy and SectionIndex of its text under 'strategy'
+    and 'index'.
+
+    With low_memory (MemoryLimits), the file is memory-mapped instead of
+    read, and the page objects and extracted text are limited as in the
+    extract and desensitize stages: pages past the text cap are left out of
+    the section search and extracted again as the desensitizer needs them.
+    """
+    import PyPDF2
+
+    metrics = FileMetrics("pipeline", pdf_path)
+    cache = open_cache(cache_path, cache_size_mb)
+    rel_path = os.path.relpath(pdf_path, raw_dir)
+
+    with ExitStack() as stack:
+        if low_memory is not None:
+            stack.callback(release_memory)
+        # The file is opened once; classification and extraction share its PdfReader, which is only
+        # created once a page has to be read
+        with metrics.timer("open"):
+            if low_memory is None:
+                pdf_file = stack.enter_context(open(pdf_path, 'rb'))
+            else:
+                pdf_file = stack.enter_context(mapped_content(pdf_path))
+        readers = []
+
+        def open_reader():
+            if not readers:
+                # PyPDF2 reads a mapping like a file
+                readers.append(PyPDF2.PdfReader(io.BytesIO(pdf_file) if isinstance(pdf_file, bytes) else pdf_file))
+            return readers[0]
+
+        # Classifying by content only reads the first page, ahead of the full read below
+        classification = classify_pdf(pdf_path, classify_by, cache, page_timeout, metrics, open_reader)
+        metrics.methods['classify_method'] = classification.method
+        is_invention = classification.is_invention
+        dest_dir = disclosure_dir if is_invention else supplementary_dir
+        dest_path = os.path.join(dest_dir, rel_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+        result = {'is_invention': is_invention, 'filename': None, 'text': None, 'desensitized': False,
+                  'outputs': [dest_path], 'hash': None, 'failed': False, 'status': "ok", 'reason': None,
+                  'strategy': None, 'index': None, 'metrics': metrics}
+
+        # Supplementary documents are only placed, never parsed beyond their first page
+        if not is_invention:
+            with metrics.timer("write"):
+                metrics.methods['link_mode'] = place_file(pdf_path, dest_path, link_mode)
+            if metrics.methods['link_mode'] == "copy":
+                metrics.bytes_read = metrics.bytes_written = os.path.getsize(dest_path)
+            # Unreadable files are placed as supplementary but classified again next run
+            result['failed'] = classification.method == "error"
+            metrics.finish("error" if result['failed'] else "ok")
+            return result
+
+        with metrics.timer("open"):
+            if low_memory is None:
+                pdf_file.seek(0)
+                content = pdf_file.read()
+            else:
+                content = pdf_file
+        metrics.bytes_read = len(content)
+        with metrics.timer("write"):
+            if link_mode == "copy":
+                # Write the copy from the bytes already in memory (or mapped)
+                with atomic_write(dest_path, 'wb') as file:
+                    file.write(content)
+                    file.flush()
+                    shutil.copystat(pdf_path, file.name)
+                metrics.methods['link_mode'] = "copy"
+                metrics.bytes_written += len(content)
+            else:
+                metrics.methods['link_mode'] = place_file(pdf_path, dest_path, link_mode)
+        result['hash'] = hash_bytes(content)
+
+        deadline = Deadline(time_budget)
+        notes = []
+        txt_filename = os.path.join(disclosure_text_dir, os.path.splitext(rel_path)[0] + ".txt")
+        try:
+            with metrics.timer("open"):
+                reader = cached_reader(cache, open_reader, lambda: result['hash'])
+            raw_page_texts = []
+            text_chars = 0
+            with metrics.timer("extract"):
+                try:
+                    for i, page in enumerate(reader.pages):
+                        deadline.check(f"after extracting {i} pages")
+                        start = time.perf_counter()
+                        try:
+                            with page_limit(page_timeout, deadline, i + 1):
+                                raw_page_texts.append(page.extract_text())
+                        except PageTimeout as e:
+                            notes.append(str(e))
+                            raw_page_texts.append("")
+                        except TimeBudgetExceeded:
+                            raise
+                        except Exception as e:
+                            print(f"Error extracting page {i} of {pdf_path}: {str(e)}")
+                            notes.append(f"page {i + 1} could not be read: {str(e)}")
+                            raw_page_texts.append("")
+                        finally:
+                            metrics.page_seconds.append(time.perf_counter() - start)
+                        if low_memory is not None:
+                            release_pages(reader)
+                            check_memory(low_memory, f"after extracting page {i + 1}")
+                            text_chars += len(raw_page_texts[-1])
+                            if text_chars >= low_memory.max_text_chars:
+                                notes.append(f"stopped reading after page {i + 1}: the extracted text reached the "
+                                             f"low-memory cap of {low_memory.max_text_chars} characters")
+                                break
+                finally:
+                    save_cached_pages(reader)
+            page_count = len(reader.pages)
+        except TimeBudgetExceeded as e:
+            print(f"Timed out processing {pdf_path}: {str(e)}")
+            notes.append(str(e))
+            result.update(failed=True, status="timeout", reason="; ".join(notes), filename=txt_filename)
+            metrics.finish("timeout")
+            return result
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {str(e)}")
+            result['failed'] = True
+            metrics.finish("error")
+            return result
+        result['reason'] = "; ".join(notes) or None
+
+        # Stage 01: text up to Section III
+        try:
+            with metrics.timer("match"):
+                boundary = find_section_boundary(raw_page_texts, strategies, deadline=deadline, metrics=metrics)
+            text = boundary.text if boundary else None
+            if boundary:
+                metrics.methods['boundary_strategy'] = boundary.strategy
+                result['strategy'] = boundary.strategy
+                result['index'] = boundary.index._replace(page_count=page_count)
+        except TimeBudgetExceeded as e:
+            notes.append(str(e))
+            result.update(failed=True, status="timeout", reason="; ".join(notes), filename=txt_filename)
+            text = None
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {str(e)}")
+            result['failed'] = True
+            text = ""
+        if text:
+            os.makedirs(os.path.dirname(txt_filename), exist_ok=True)
+            with metrics.timer("write"), atomic_write(txt_filename, 'w', encoding='utf-8') as f:
+                f.write(text)
+                metrics.bytes_written += f.tell()
+            result['filename'] = txt_filename
+            result['text'] = text
+            result['outputs'].append(txt_filename)
+
+        # Stage 02: drop the contributor/signature section
+        desensitized_path = os.path.join(desensitized_dir, os.path.basename(pdf_path))
+        os.makedirs(desensitized_dir, exist_ok=True)
+        try:
+            if low_memory is None:
+                page_texts = [page_text.lower() for page_text in raw_page_texts]
+            else:
+                page_texts = LazyPageTexts(reader, page_timeout, metrics=metrics, low_memory=low_memory,
+                                           texts=[page_text.lower() for page_text in raw_page_texts])
+                # The lowercased copies are all the desensitizer needs
+                del raw_page_texts
+            desensitize_reader(real_reader(reader), page_texts, desensitized_path, metrics, low_memory)
+            result['desensitized'] = True
+            result['outputs'].append(desensitized_path)
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {str(e)}")
+            result['failed'] = True
+
+        metrics.finish("error" if result['failed'] and result['status'] == "ok" else result['status'])
+        return result
+
+def duplicate_result(pdf_path, original, digest, raw_dir, disclosure_dir, supplementary_dir, disclosure_text_dir,
+                     desensitized_dir, link_mode="copy"):
+    """
+    Give a raw PDF the results of another PDF with the same content, without reading it.
+
+    original is the other PDF's result. In copy mode the classified copy is
+    a hard link of the original's copy; the desensitized PDF always is. The
+    text file is written from the original's text.
+    """
+    metrics = FileMetrics("pipeline", pdf_path)
+    metrics.methods['dedup'] = "duplicate"
+    rel_path = os.path.relpath(pdf_path, raw_dir)
+    dest_dir = disclosure_dir if original['is_invention'] else supplementary_dir
+    dest_path = os.path.join(dest_dir, rel_path)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+    result = dict(original, filename=None, desensitized=False, outputs=[dest_path], hash=digest, metrics=metrics)
+    with metrics.timer("write"):
+        if link_mode == "copy":
+            metrics.methods['link_mode'] = link_output(original['outputs'][0], dest_path)
+        else:
+            metrics.methods['link_mode'] = place_file(pdf_path, dest_path, link_mode)
+
+        txt_filename = os.path.join(disclosure_text_dir, os.path.splitext(rel_path)[0] + ".txt")
+        if original['filename'] is not None:
+            result['filename'] = txt_filename
+        if original['text']:
+            os.makedirs(os.path.dirname(txt_filename), exist_ok=True)
+            with atomic_write(txt_filename, 'w', encoding='utf-8') as f:
+                f.write(original['text'])
+                metrics.bytes_written += f.tell()
+            result['outputs'].append(txt_filename)
+
+        if original['desensitized']:
+            original_desensitized = next(output for output in original['outputs']
+                                         if output.startswith(os.path.join(desensitized_dir, "")))
+            desensitized_path = os.path.join(desensitized_dir, os.path.basename(pdf_path))
+            link_output(original_desensitized, desensitized_path)
+            result['desensitized'] = True
+            result['outputs'].append(desensitized_path)
+
+    metrics.finish("error" if result['failed'] and result['status'] == "ok" else result['status'])
+    return result
+
+def previous_result(pdf_path, outputs, disclosure_dir, disclosure_text_dir, desensitized_dir, details=None):
+    """Rebuild the result of an unchanged PDF from the outputs and details recorded in the manifest."""
+    # The first output is the classified copy, so its directory tells which kind the PDF is
+    is_invention = outputs[0].startswith(os.path.join(disclosure_dir, ""))
+    details = details or {}
+    result = {'is_invention': is_invention, 'filename': None, 'text': None,
+              'desensitized': False, 'outputs': outputs, 'hash': None, 'failed': False, 'status': "ok",
+              'reason': None, 'strategy': details.get('strategy'), 'index': index_from_columns(details)}
+    for output in outputs:
+        if output.startswith(os.path.join(disclosure_text_dir, "")):
+            with open(output, 'r', encoding='utf-8') as f:
+                result['filename'] = output
+                result['text'] = f.read()
+        elif output.startswith(os.path.join(desensitized_dir, "")):
+            result['desensitized'] = True
+    return result
+
+def find_batch_duplicates(pdf_files, pending, manifest=None, workers=1):
+    """
+    Group the PDFs of a batch by content (see find_duplicates).
+
+    Unchanged files are preferred as originals. Files recorded in the
+    manifest outside the batch also count when they are unchanged and have
+    the size of a pending file, so a copy of a PDF processed earlier reuses
+    its outputs.
+    """
+    current = [pdf_path for pdf_path in pdf_files if pdf_path not in pending]
+    candidates = list(pdf_files)
+    if manifest is not None:
+        batch = set(pdf_files)
+        sizes = {os.path.getsize(pdf_path) for pdf_path in pending}
+        earlier = [path for path, entry in manifest.entries.items()
+                   if path not in batch and entry['size'] in sizes and os.path.exists(path)
+                   and manifest.is_current(path)]
+        current += earlier
+        candidates += earlier
+    known_hashes = {path: manifest.recorded_hash(path) for path in current}
+    return find_duplicates(candidates, known_hashes, current, workers)
+
+def process_batch(pdf_files, manifest, parquet_path, report, raw_dir, disclosure_dir, supplementary_dir,
+                  disclosure_text_dir, desensitized_dir, workers=1, link_mode="copy", row_group_size=500,
+                  strategies=None, time_budget=None, page_timeout=None, cache_path=None,
+                  cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", dedup=False, duplicates_path=None,
+                  include_unchanged=True, part_of=None, low_memory=None):
+    """
+    Classify, extract and desensitize pdf_files and write their rows to the parquet file at parquet_path.
+
+    Files the manifest (if any) has as unchanged are not processed again;
+    with include_unchanged their rows are rebuilt from their text files,
+    otherwise they are left out. With dedup, PDFs with the same content are
+    processed once and the results are fanned out to every copy (see
+    duplicate_result), and the groups are written to duplicates_path if
+    given. With part_of, a function giving the part file of each PDF, the
+    rows are written to those parts instead of parquet_path (see
+    PartitionedRowWriter); the PDFs of a part must be next to each other in
+    pdf_files. low_memory (MemoryLimits) turns on low-memory mode (see
+    process_raw_pdf). Per-file metrics go to report, a RunReport. Returns
+    the number of rows written.
+    """
+    from tqdm import tqdm
+    from disclosure_cleanup.parquet_writer import ParquetRowWriter, PartitionedRowWriter
+
+    pending_files = pdf_files
+    if manifest is not None:
+        pending_files = [pdf_path for pdf_path in pdf_files if not manifest.is_current(pdf_path)]
+        if len(pending_files) < len(pdf_files):
+            print(f"Skipping {len(pdf_files) - len(pending_files)} files that are already done")
+    pending = set(pending_files)
+
+    # Files with the same content as an unchanged file reuse its outputs
+    duplicates = {}
+    if dedup:
+        duplicates = find_batch_duplicates(pdf_files, pending, manifest, workers)
+        print_duplicate_summary(duplicates)
+        if duplicates_path is not None:
+            write_duplicates_table(duplicates_path, duplicates, pdf_files)
+    originals = {}
+
+    process = functools.partial(process_raw_pdf, raw_dir=raw_dir, disclosure_dir=disclosure_dir,
+                                supplementary_dir=supplementary_dir,
+                                disclosure_text_dir=disclosure_text_dir,
+                                desensitized_dir=desensitized_dir, link_mode=link_mode,
+                                strategies=strategies, time_budget=time_budget, page_timeout=page_timeout,
+                                cache_path=cache_path, cache_size_mb=cache_size_mb, classify_by=classify_by,
+                                low_memory=low_memory)
+
+    invention_count = 0
+    supplementary_count = 0
+    desensitized_count = 0
+    timeout_count = 0
+
+    # Results arrive in the same order as pending_files, which keeps the rows in PDF file order
+    processed = imap_ordered(process, [pdf_path for pdf_path in pending_files
+                                       if original_of(duplicates, pdf_path) is None], workers)
+    try:
+        if part_of is None:
+            writer = ParquetRowWriter(parquet_path, row_group_size=row_group_size)
+        else:
+            writer = PartitionedRowWriter(row_group_size=row_group_size)
+        with writer, tqdm(total=len(pending_files), desc="Processing documents", unit="file") as progress:
+            for pdf_path in pdf_files:
+                if part_of is not None:
+                    writer.open_part(part_of(pdf_path))
+                if pdf_path in pending:
+                    original = original_of(duplicates, pdf_path)
+                    if original is None:
+                        _, result = next(processed)
+                        if pdf_path in duplicates:
+                            originals[pdf_path] = result
+                    else:
+                        if original not in originals:
+                            originals[original] = previous_result(original, manifest.outputs(original),
+                                                                  disclosure_dir, disclosure_text_dir,
+                                                                  desensitized_dir, manifest.details(original))
+                        result = originals[original]
+                        if result is not None:
+                            result = duplicate_result(pdf_path, result, duplicates[pdf_path].content_hash, raw_dir,
+                                                      disclosure_dir, supplementary_dir, disclosure_text_dir,
+                                                      desensitized_dir, link_mode)
+                    progress.update()
+                    if result is None:
+                        report.add(FileMetrics("pipeline", pdf_path).finish("error"))
+                        continue
+                    report.add(result['metrics'])
+                    # Files with errors are left out of the manifest so they are retried next run
+                    if manifest is not None and not result['failed']:
+                        digest = result['hash'] or (duplicates[pdf_path].content_hash if pdf_path in duplicates
+                                                    else None)
+                        details = index_columns(result['strategy'], result['index']) if result['index'] else None
+                        manifest.record(pdf_path, result['outputs'], digest, details)
+                elif include_unchanged:
+                    result = previous_result(pdf_path, manifest.outputs(pdf_path), disclosure_dir,
+                                             disclosure_text_dir, desensitized_dir, manifest.details(pdf_path))
+                else:
+                    continue
+
+                if result['is_invention']:
+                    invention_count += 1
+                else:
+                    supplementary_count += 1
+                if result['desensitized']:
+                    desensitized_count += 1
+                if result['status'] == "timeout":
+                    timeout_count += 1
+                    writer.write({'filename': result['filename'], 'text': None, 'status': result['status'],
+                                  'reason': result['reason']})
+                elif result['text']:
+                    writer.write({'filename': result['filename'], 'text': result['text'],
+                                  'status': result['status'], 'reason': result['reason'],
+                                  **index_columns(result['strategy'], result['index'])})
+    finally:
+        processed.close()
+        if manifest is not None:
+            manifest.save()
+
+    print(f"Processed {len(pdf_files)} files:")
+    print(f"- {invention_count} invention disclosures")
+    print(f"- {supplementary_count} supplementary documents")
+    print(f"- Extracted content from {writer.rows_written - timeout_count} files")
+    print(f"- Desensitized {desensitized_count} files")
+    if timeout_count:
+        print(f"- Timed out on {timeout_count} files")
+    return writer.rows_written
+
+def run_pipeline(raw_dir, disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir,
+                 output_dir, workers=1, manifest_path=None, link_mode="copy", row_group_size=500,
+                 strategies=None, time_budget=None, page_timeout=None, report_path=None, prometheus_path=None,
+                 cache_path=None, cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", dedup=False,
+                 resume=False, checkpoint_interval=CHECKPOINT_SECONDS, low_memory=None):
+    """
+    Classify, extract and desensitize every PDF in raw_dir in a single pass.
+
+    Per-file metrics go to the run report at report_path and run totals to
+    the Prometheus textfile at prometheus_path. With dedup, raw PDFs with the
+    same content are processed once and the results are fanned out to every
+    copy (see duplicate_result); duplicates.parquet in output_dir maps each
+    copy to the PDF that was processed. Finished PDFs are checkpointed (see
+    open_manifest); with resume, the PDFs an interrupted run finished are
+    not processed again. low_memory (MemoryLimits) turns on low-memory mode
+    (see process_raw_pdf).
+    """
+    print(f"Starting single-pass pipeline from {raw_dir}...")
+
+    for directory in (disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir, output_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    pdf_files = find_pdf_files(raw_dir)
+    print(f"Found {len(pdf_files)} PDF files")
+
+    # Rebuild the results of unchanged PDFs (in incremental mode) and of PDFs done before an interruption
+    manifest, is_checkpoint = open_manifest(manifest_path, checkpoint_path(output_dir, "pipeline"), resume,
+                                            checkpoint_interval)
+    removed = manifest.remove_stale(pdf_files)
+    if removed:
+        print(f"Removed outputs of {len(removed)} deleted files")
+
+    with RunReport(report_path, prometheus_path) as report:
+        rows = process_batch(pdf_files, manifest, os.path.join(output_dir, "all_extracted_texts.parquet"), report,
+                             raw_dir, disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir,
+                             workers, link_mode, row_group_size, strategies, time_budget, page_timeout, cache_path,
+                             cache_size_mb, classify_by, dedup, os.path.join(output_dir, DUPLICATES_TABLE),
+                             low_memory=low_memory)
+    if is_checkpoint:
+        manifest.discard()
+    return rows
+
+def add_pipeline_arguments(parser):
+    """Add the options of the single-pass pipeline to an argparse parser."""
+    parser.add_argument("--raw-dir", default="raw", help="Directory containing raw PDF files")
+    parser.add_argument("--disclosure-dir", default="data/invention_disclosure",
+                       help="Directory to save invention disclosure forms")
+    parser.add_argument("--supplementary-dir", default="data/supplementary_information",
+                       help="Directory to save supplementary documents")
+    parser.add_argument("--disclosure-text-dir", default="data/invention_disclosure_text",
+                       help="Directory to save extracted text files")
+    parser.add_argument("--desensitized-dir", default="data/desensitized",
+                       help="Directory to save desensitized forms")
+    parser.add_argument("--output-dir", default="data", help="Directory to save the output parquet file")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--manifest", default=None,
+                       help="Manifest file for incremental runs; unchanged PDFs are skipped")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="copy",
+                       help="How to place classified files; falls back to copy if unsupported")
+    parser.add_argument("--classify-by", choices=CLASSIFY_MODES, default="content",
+                       help="Classify by the first page's content (files named like disclosure forms are still "
+                            "taken as such) or by the filename only")
+    parser.add_argument("--row-group-size", type=int, default=500,
+                       help="Number of documents per parquet row group")
+    parser.add_argument("--strategies", type=parse_strategy_list, default=None,
+                       help="Comma-separated boundary strategies to use, run cheapest-first "
+                            f"(available: {', '.join(STRATEGIES)}; default: all)")
+    add_dedup_arguments(parser)
+    add_budget_arguments(parser)
+    add_report_arguments(parser)
+    add_cache_arguments(parser)
+    add_memory_arguments(parser)
+    return parser
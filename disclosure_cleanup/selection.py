@@ -0,0 +1,413 @@
+"""
+Classification of raw PDFs into invention disclosures and supplementary documents,
+and placement of the classified files.
+
+Files named like disclosure forms are taken as such without being opened.
+Every other PDF is classified by the text of its first page, which is
+found by walking the page tree from the catalog; the rest of the document
+is never loaded, so a large research paper costs about as much as a
+one-page memo.
+"""
+import os
+import re
+import errno
+import shutil
+import functools
+from collections import namedtuple
+from contextlib import ExitStack
+from pathlib import Path
+from disclosure_cleanup.atomic import discard, temporary_path
+from disclosure_cleanup.budget import page_limit
+from disclosure_cleanup.dedup import (add_dedup_arguments, find_duplicates, link_output, original_of,
+                                      print_duplicate_summary)
+from disclosure_cleanup.manifest import CHECKPOINT_SECONDS, add_checkpoint_arguments, checkpoint_path, open_manifest
+from disclosure_cleanup.metrics import FileMetrics, RunReport, add_report_arguments
+from disclosure_cleanup.page_cache import DEFAULT_CACHE_SIZE_MB, add_cache_arguments, open_cache
+from disclosure_cleanup.parallel import imap_ordered
+from disclosure_cleanup.sources import is_path, open_source, source_name
+
+# The title of a disclosure form reads "TECHNOLOGY DISCLOSURE FORM"
+FORM_TITLE = "technologydisclosureform"
+FORM_KEYWORDS = {"technology", "disclosure", "form"}
+
+# Number of non-empty lines at the top of the first page searched for the title
+TITLE_LINES = 8
+
+# Section headers of a disclosure form (e.g. "I. CONTRIBUTORS"), matched against a line without its spaces
+FORM_HEADER_PATTERN = re.compile(r"(?:i|ii|iii|iv)\.?(?:contributors|descriptionoftheinvention|additionalinformation"
+                                 r"|contributorsignatures)")
+
+# Longest line (without spaces) taken as a header rather than a sentence that mentions one
+HEADER_LINE_LENGTH = 60
+
+# Bump when the classification rules change so cached classifications are redone
+CLASSIFIER_REVISION = 2
+
+CLASSIFY_MODES = ["content", "filename"]
+
+# Outcome of classifying one PDF and the check that decided it:
+# "filename", "title", "headers", "none" (not a disclosure) or "error"
+Classification = namedtuple("Classification", ["is_invention", "method"])
+
+# Page attributes a page inherits from its ancestors in the page tree
+INHERITABLE_PAGE_ATTRIBUTES = ["/Resources", "/MediaBox", "/CropBox", "/Rotate"]
+
+def find_pdf_files(directory):
+    """Find all PDF files in a directory and its subdirectories."""
+    pdf_files = []
+    # Use Path.rglob for recursive glob pattern matching
+    for file_path in Path(directory).rglob("*.pdf"):
+        pdf_files.append(str(file_path))
+    return pdf_files
+
+LINK_MODES = ["copy", "hardlink", "reflink", "symlink"]
+
+# ioctl request number of FICLONE on Linux (btrfs, XFS, overlayfs, ...)
+FICLONE = 0x40049409
+
+def reflink_file(src, dest):
+    """Create a copy-on-write clone of src at dest; raises OSError if unsupported."""
+    import fcntl
+
+    with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+        try:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dest_file.close()
+            os.remove(dest)
+            raise
+    shutil.copystat(src, dest)
+
+def place_file(src, dest, link_mode="copy"):
+    """
+    Place src at dest by copying, hard-linking, reflinking or symlinking it.
+
+    If the filesystem does not support the requested mode (e.g. a hardlink
+    across devices or a reflink on ext4), the file is copied instead. The
+    file is placed under a temporary name and renamed over dest, so dest is
+    always either the previous file or the complete new one. Returns the
+    mode that was actually used.
+    """
+    tmp_path = temporary_path(dest)
+    try:
+        used_mode = "copy"
+        try:
+            if link_mode == "hardlink":
+                os.link(src, tmp_path)
+                used_mode = link_mode
+            elif link_mode == "symlink":
+                os.symlink(os.path.abspath(src), tmp_path)
+                used_mode = link_mode
+            elif link_mode == "reflink":
+                reflink_file(src, tmp_path)
+                used_mode = link_mode
+        except (OSError, ImportError) as e:
+            if isinstance(e, OSError) and e.errno not in (errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK,
+                                                          errno.ENOTSUP, errno.EOPNOTSUPP, errno.EINVAL,
+                                                          errno.ENOTTY, errno.ENOSYS):
+                raise
+
+        if used_mode == "copy":
+            shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dest)
+        return used_mode
+    finally:
+        discard(tmp_path)
+
+def is_invention_disclosure(pdf_path):
+    """Determine if a PDF is an invention disclosure based on its filename."""
+    return "InventionDisclosure" in os.path.basename(pdf_path)
+
+def first_page(reader):
+    """
+    The first page of a PdfReader, or None if it has no pages.
+
+    Unlike reader.pages[0], which loads the dictionary of every page, this
+    only follows the first kid at each level of the page tree.
+    """
+    from PyPDF2 import PageObject
+    from PyPDF2.generic import IndirectObject
+
+    node = reader.trailer["/Root"]["/Pages"]
+    inherited = {}
+    reference = None
+    while node.get("/Type") == "/Pages" or "/Kids" in node:
+        for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+            if attribute in node:
+                inherited[attribute] = node[attribute]
+        kids = node.get("/Kids")
+        if not kids:
+            return None
+        reference = kids[0] if isinstance(kids[0], IndirectObject) else None
+        node = kids[0].get_object()
+
+    page = PageObject(reader, reference)
+    page.update(node)
+    for attribute, value in inherited.items():
+        if attribute not in page:
+            page[attribute] = value
+    return page
+
+def first_page_text(source, page_timeout=None, metrics=None, open_reader=None):
+    """
+    Text of the first page of a PDF, reading only its trailer, cross-reference table and first page.
+
+    open_reader, if given, returns a PdfReader of source to use instead of opening source again.
+    """
+    import PyPDF2
+
+    metrics = metrics or FileMetrics("select", source_name(source) or "<bytes>")
+    with ExitStack() as stack:
+        with metrics.timer("open"):
+            if open_reader is None:
+                # An open file, unlike a path, is not read into memory up front
+                reader = PyPDF2.PdfReader(stack.enter_context(open_source(source)))
+            else:
+                reader = open_reader()
+            page = first_page(reader)
+        if page is None:
+            return ""
+        with metrics.timer("extract"), page_limit(page_timeout, None, 1):
+            return page.extract_text()
+
+def classify_text(text):
+    """Classify a PDF by the text of its first page."""
+    lines = [re.sub(r"\s+", "", line) for line in text.lower().splitlines() if line.strip()]
+    # Layout check: the title at the top of the page, ignoring the spacing PDF text extraction adds or drops
+    if FORM_TITLE in "".join(lines[:TITLE_LINES]):
+        return Classification(True, "title")
+    # Otherwise the words of the title must come with a section header of the form on a line of its own,
+    # so a paper that merely mentions a technology disclosure form is not taken for one
+    if FORM_KEYWORDS <= set(re.findall(r"[a-z]+", text.lower())) and \
+            any(len(line) <= HEADER_LINE_LENGTH and FORM_HEADER_PATTERN.match(line) for line in lines):
+        return Classification(True, "headers")
+    return Classification(False, "none")
+
+def classify_pdf(source, mode="content", cache=None, page_timeout=None, metrics=None, open_reader=None):
+    """
+    Classify a PDF (a path, bytes or a binary file-like object) as an invention disclosure or not.
+
+    With mode "filename" only the filename is checked. With mode "content",
+    PDFs whose name does not give them away are classified by their first
+    page. Results for paths are kept in the page cache `cache` while the
+    file's size and mtime stay the same. A PDF that cannot be read is
+    treated as supplementary, with method "error". open_reader, if given,
+    returns a PdfReader of source; it is only called if the first page has
+    to be read, and lets the caller go on with the same parsed PDF.
+    """
+    name = source_name(source)
+    metrics = metrics or FileMetrics("select", name or "<bytes>")
+    if name is not None and is_invention_disclosure(name):
+        return Classification(True, "filename")
+    if mode == "filename":
+        return Classification(False, "none")
+
+    key = None
+    if cache is not None and is_path(source):
+        stat = os.stat(source)
+        key = (os.path.abspath(source), stat.st_size, stat.st_mtime_ns, CLASSIFIER_REVISION)
+        cached = cache.load_classification(*key)
+        if cached is not None:
+            return Classification(*cached)
+
+    try:
+        text = first_page_text(source, page_timeout, metrics, open_reader)
+    except Exception as e:
+        print(f"Error classifying {name or '<bytes>'}: {str(e)}")
+        return Classification(False, "error")
+    with metrics.timer("match"):
+        classification = classify_text(text)
+    if key is not None:
+        cache.store_classification(*key, *classification)
+    return classification
+
+def classify_file(pdf_path, mode="content", cache_path=None, cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+                  page_timeout=None):
+    """Classify one file in a worker process; returns (Classification, FileMetrics)."""
+    metrics = FileMetrics("select", pdf_path)
+    classification = classify_pdf(pdf_path, mode, open_cache(cache_path, cache_size_mb), page_timeout, metrics)
+    metrics.methods['classify_method'] = classification.method
+    return classification, metrics
+
+def process_pdfs(raw_dir, disclosure_dir, supplementary_dir, manifest_path=None, link_mode="copy",
+                 report_path=None, prometheus_path=None, workers=1, mode="content", cache_path=None,
+                 cache_size_mb=DEFAULT_CACHE_SIZE_MB, dedup=False, resume=False,
+                 checkpoint_interval=CHECKPOINT_SECONDS):
+    """
+    Process PDFs and separate them into invention disclosures and supplementary documents.
+
+    The files are classified (see classify_pdf) by `workers` processes and
+    placed in the order they were found. The classification and placement
+    times, classification method, link mode used and bytes copied of each
+    file go to the run report at report_path.
+
+    With dedup, files with the same content are classified once, and in
+    copy mode their copies are hard links of a single copy. Placed files
+    are checkpointed (see open_manifest); with resume, the files an
+    interrupted run placed are skipped.
+    """
+    from tqdm import tqdm
+
+    print(f"Starting document classification from {raw_dir}...")
+    
+    # Make sure destination directories exist
+    os.makedirs(disclosure_dir, exist_ok=True)
+    os.makedirs(supplementary_dir, exist_ok=True)
+    
+    # Get all PDF files in raw directory and subdirectories
+    pdf_files = find_pdf_files(raw_dir)
+    
+    print(f"Found {len(pdf_files)} PDF files")
+    
+    # Skip unchanged files (in incremental mode) and files done before an interruption
+    manifest, is_checkpoint = open_manifest(manifest_path, checkpoint_path(disclosure_dir, "select"), resume,
+                                            checkpoint_interval)
+    removed = manifest.remove_stale(pdf_files)
+    if removed:
+        print(f"Removed outputs of {len(removed)} deleted files")
+    pending_files = [pdf_path for pdf_path in pdf_files if not manifest.is_current(pdf_path)]
+    pending = set(pending_files)
+    current = [pdf_path for pdf_path in pdf_files if pdf_path not in pending]
+
+    # Files with the same content as an unchanged file reuse its classification and copy
+    duplicates = {}
+    if dedup:
+        duplicates = find_duplicates(pdf_files, {path: manifest.recorded_hash(path) for path in current},
+                                     current, workers)
+        print_duplicate_summary(duplicates)
+    # The manifest does not keep how an unchanged file was classified, only where its copy went
+    placed = {}
+    for pdf_path in current:
+        if pdf_path in duplicates:
+            copy_path = manifest.outputs(pdf_path)[0]
+            placed[pdf_path] = (Classification(copy_path.startswith(os.path.join(disclosure_dir, "")), "duplicate"),
+                                copy_path)
+    
+    # Counters for classified documents
+    invention_count = 0
+    supplementary_count = 0
+    skipped_count = 0
+    fallback_count = 0
+    method_counts = {}
+    
+    # Classification results arrive in the same order as pending_files
+    classify = functools.partial(classify_file, mode=mode, cache_path=cache_path, cache_size_mb=cache_size_mb)
+    classified = imap_ordered(classify, [pdf_path for pdf_path in pending_files
+                                         if original_of(duplicates, pdf_path) is None], workers)
+    
+    # Process each PDF with progress bar
+    report = RunReport(report_path, prometheus_path)
+    try:
+        for pdf_path in tqdm(pdf_files, desc="Classifying documents", unit="file"):
+            # Get the relative path from raw_dir to maintain directory structure
+            rel_path = os.path.relpath(pdf_path, raw_dir)
+            
+            if pdf_path not in pending:
+                # Unchanged since the last run: the recorded copy tells which kind it is
+                is_invention = manifest.outputs(pdf_path)[0].startswith(os.path.join(disclosure_dir, ""))
+                if is_invention:
+                    invention_count += 1
+                else:
+                    supplementary_count += 1
+                skipped_count += 1
+                continue
+            
+            original = original_of(duplicates, pdf_path)
+            if original is not None:
+                # Same content as another file: take its classification instead of reading this one
+                if original not in placed:
+                    report.add(FileMetrics("select", pdf_path).finish("error"))
+                    continue
+                classification, original_copy = placed[original]
+                metrics = FileMetrics("select", pdf_path)
+                metrics.methods['classify_method'] = classification.method
+                metrics.methods['dedup'] = "duplicate"
+            else:
+                _, result = next(classified)
+                if result is None:
+                    report.add(FileMetrics("select", pdf_path).finish("error"))
+                    continue
+                classification, metrics = result
+                original_copy = None
+            is_invention = classification.is_invention
+            # Copies are counted apart, so the method counts only cover files that were read
+            method = "duplicate" if original is not None else classification.method
+            method_counts[method] = method_counts.get(method, 0) + 1
+            
+            # Choose destination directory
+            dest_dir = disclosure_dir if is_invention else supplementary_dir
+            
+            # Create destination path maintaining the same directory structure
+            dest_path = os.path.join(dest_dir, rel_path)
+            
+            # Update counters
+            if is_invention:
+                invention_count += 1
+            else:
+                supplementary_count += 1
+            
+            # Create parent directories if they don't exist
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            
+            # Copy or link the file
+            with metrics.timer("write"):
+                if original_copy is not None and link_mode == "copy":
+                    # Keep one copy of the content: link the copy of the original
+                    used_mode = link_output(original_copy, dest_path)
+                else:
+                    used_mode = place_file(pdf_path, dest_path, link_mode)
+                    if used_mode != link_mode:
+                        fallback_count += 1
+            metrics.methods['link_mode'] = used_mode
+            if pdf_path in duplicates:
+                placed[pdf_path] = (classification, dest_path)
+            if used_mode == "copy":
+                metrics.bytes_read = metrics.bytes_written = os.path.getsize(dest_path)
+            report.add(metrics.finish("ok"))
+            
+            # Unreadable files are left out of the manifest so they are classified again next run
+            if classification.method != "error":
+                digest = duplicates[pdf_path].content_hash if pdf_path in duplicates else None
+                manifest.record(pdf_path, [dest_path], digest)
+    finally:
+        classified.close()
+        report.close()
+        manifest.save()
+    if is_checkpoint:
+        manifest.discard()
+    
+    print(f"Processed {len(pdf_files)} files:")
+    print(f"- {invention_count} invention disclosures")
+    print(f"- {supplementary_count} supplementary documents")
+    content_count = method_counts.get("title", 0) + method_counts.get("headers", 0)
+    if content_count:
+        print(f"- {content_count} of the disclosures recognized by their first page")
+    if method_counts.get("error"):
+        print(f"- {method_counts['error']} unreadable files treated as supplementary")
+    if method_counts.get("duplicate"):
+        print(f"- {method_counts['duplicate']} copies given the classification of a file with the same content")
+    if skipped_count:
+        print(f"- {skipped_count} already done")
+    if fallback_count:
+        print(f"- {fallback_count} files copied because {link_mode} is not supported")
+
+def add_selection_arguments(parser):
+    """Add the options of the select stage to an argparse parser."""
+    parser.add_argument("--raw-dir", default="raw", help="Directory containing raw PDF files")
+    parser.add_argument("--disclosure-dir", default="data/invention_disclosure", 
+                       help="Directory to save invention disclosure forms")
+    parser.add_argument("--supplementary-dir", default="data/supplementary", 
+                       help="Directory to save supplementary documents")
+    parser.add_argument("--manifest", default=None,
+                       help="Manifest file for incremental runs; unchanged PDFs are skipped")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="copy",
+                       help="How to place classified files; falls back to copy if unsupported")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes for classification")
+    parser.add_argument("--classify-by", choices=CLASSIFY_MODES, default="content",
+                       help="Classify by the first page's content (files named like disclosure forms are still "
+                            "taken as such) or by the filename only")
+    add_dedup_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_report_arguments(parser)
+    add_cache_arguments(parser)
+    return parser
@@ -0,0 +1,310 @@
+"""
+Local HTTP service that extracts and desensitizes PDFs on demand.
+
+Tools that need the text of a disclosure up to Section III, or a
+desensitized copy of it, can ask this service instead of starting a script
+per file. The service keeps a warm process pool (PyPDF2 already imported
+in every worker), so a request only pays for the work on its own
+documents. It binds to 127.0.0.1 and needs nothing beyond the standard
+library and the pipeline's own dependencies.
+
+    POST /extract        a PDF as the body -> JSON result of extract_document
+    POST /desensitize    a PDF as the body -> the desensitized PDF
+    GET  /metrics        Prometheus metrics
+    GET  /healthz        "ok"
+
+Instead of a PDF, both POST endpoints take a JSON body naming one document,
+{"path": "..."} or {"pdf": "<base64>"}, or a batch of them,
+{"documents": [...]}. Answers to JSON requests are JSON, with desensitized
+PDFs base64-encoded; the documents of a batch are spread over the pool.
+Paths must lie inside one of the allowed directories.
+
+Backpressure: at most max_pending documents are queued or being processed.
+A request that would go over that is turned away with 503 and a
+Retry-After header, as are batches larger than max_batch (413) and bodies
+larger than max_body_mb (413). A client that stalls for request_timeout
+seconds is disconnected, with a 408 if it stalls while sending a body.
+"""
+import os
+import json
+import time
+import base64
+import socket
+import binascii
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from disclosure_cleanup.api import DEFAULT_BATCH_SIZE
+from disclosure_cleanup.desensitization import DesensitizeResult, desensitize_bytes
+from disclosure_cleanup.extraction import ExtractionResult, extract_document
+from disclosure_cleanup.metrics import RunReport
+from disclosure_cleanup.page_cache import DEFAULT_CACHE_SIZE_MB
+from disclosure_cleanup.service_options import DEFAULT_PORT, HOST, REQUEST_TIMEOUT, add_service_arguments
+
+class RequestError(Exception):
+    """A request that is answered with an HTTP error status."""
+
+    def __init__(self, code, message, headers=None):
+        super().__init__(message)
+        self.code = code
+        self.headers = headers or {}
+
+def warm_up():
+    """Import PyPDF2 in a worker process so the first request does not pay for it."""
+    import PyPDF2
+
+    return os.getpid()
+
+def extraction_json(result):
+    return {'text': result.text, 'strategy': result.strategy, 'status': result.status, 'reason': result.reason,
+            'index': result.index._asdict() if result.index else None}
+
+def desensitized_json(result):
+    return {'pdf': base64.b64encode(result.pdf).decode("ascii") if result.pdf is not None else None,
+            'pages_kept': result.pages_kept, 'marker_page': result.marker_page, 'method': result.method,
+            'status': result.status, 'reason': result.reason}
+
+class Service:
+    """The warm process pool, the backpressure limits and the metrics behind the HTTP endpoints."""
+
+    def __init__(self, workers, max_pending, max_batch, max_body_bytes, allowed_dirs, extract, desensitize):
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.max_body_bytes = max_body_bytes
+        self.allowed_dirs = [os.path.realpath(directory) for directory in allowed_dirs]
+        self.endpoints = {
+            '/extract': (extract, ExtractionResult("", None, "error", "worker failed"), extraction_json),
+            '/desensitize': (desensitize, DesensitizeResult(None, None, None, None, "error", "worker failed", None),
+                             desensitized_json),
+        }
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.report = RunReport()
+        self.report.totals[("pending_documents", ())] = 0
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        for future in [self.executor.submit(warm_up) for _ in range(workers)]:
+            future.result()
+
+    def reserve(self, count):
+        """Take count of the max_pending slots, or raise a 503 RequestError if they are not free."""
+        with self.lock:
+            if self.pending + count > self.max_pending:
+                raise RequestError(503, f"{self.pending} documents already pending", {'Retry-After': "1"})
+            self.pending += count
+            self.report.totals[("pending_documents", ())] = self.pending
+
+    def release(self, count):
+        with self.lock:
+            self.pending -= count
+            self.report.totals[("pending_documents", ())] = self.pending
+
+    def submit(self, func, source):
+        """Submit func(source) to the pool, replacing the pool if a worker died."""
+        from concurrent.futures.process import BrokenProcessPool
+
+        executor = self.executor
+        try:
+            return executor.submit(func, source)
+        except BrokenProcessPool:
+            self.restart(executor)
+            return self.executor.submit(func, source)
+
+    def restart(self, broken):
+        """Replace a broken pool, unless another request did so already."""
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self.lock:
+            if self.executor is broken:
+                print("Worker process died, restarting pool")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def process(self, endpoint, sources):
+        """Run the endpoint's function on every source in the pool and return the results in order."""
+        from concurrent.futures.process import BrokenProcessPool
+
+        func, failed, _ = self.endpoints[endpoint]
+        self.reserve(len(sources))
+        try:
+            futures = [(self.executor, self.submit(func, source)) for source in sources]
+            results = []
+            for executor, future in futures:
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    self.restart(executor)
+                    result = failed
+                except Exception as e:
+                    print(f"Error processing a document: {str(e)}")
+                    result = failed
+                if result.metrics is not None:
+                    with self.lock:
+                        self.report.add(result.metrics)
+                results.append(result)
+            return results
+        finally:
+            self.release(len(sources))
+
+    def source(self, document):
+        """Turn one JSON document ({"path": ...} or {"pdf": base64}) into a source for the workers."""
+        if not isinstance(document, dict):
+            raise RequestError(400, "each document must be an object with a path or pdf")
+        if 'pdf' in document:
+            try:
+                return base64.b64decode(document['pdf'], validate=True)
+            except (binascii.Error, TypeError) as e:
+                raise RequestError(400, f"pdf is not valid base64: {str(e)}")
+        if 'path' in document:
+            path = os.path.realpath(str(document['path']))
+            if not any(os.path.commonpath([path, directory]) == directory for directory in self.allowed_dirs):
+                raise RequestError(403, f"{document['path']} is outside the allowed directories")
+            return path
+        raise RequestError(400, "each document must have a path or pdf")
+
+    def count_request(self, endpoint, code, seconds):
+        with self.lock:
+            self.report.count("http_requests_total", {'endpoint': endpoint, 'code': str(code)})
+            self.report.count("http_request_seconds_total", {'endpoint': endpoint}, seconds)
+
+    def metrics_text(self):
+        with self.lock:
+            return self.report.prometheus_text()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "disclosure-cleanup"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def setup(self):
+        # StreamRequestHandler puts this timeout on the socket, so a client that stalls cannot hold a thread
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+    def send(self, code, body, content_type, headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return code
+
+    def send_json(self, code, data, headers=None):
+        return self.send(code, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        if self.path == "/metrics":
+            code = self.send(200, self.service.metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+        elif self.path == "/healthz":
+            code = self.send(200, b"ok\n", "text/plain")
+        else:
+            code = self.send_json(404, {'error': f"no such endpoint {self.path}"})
+        self.service.count_request(self.path if code != 404 else "other", code, time.perf_counter() - start)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        endpoint = self.path if self.path in self.service.endpoints else "other"
+        try:
+            if endpoint == "other":
+                raise RequestError(404, f"no such endpoint {self.path}")
+            code = self.handle_documents(endpoint, self.read_body())
+        except RequestError as e:
+            code = self.send_json(e.code, {'error': str(e)}, e.headers)
+        self.service.count_request(endpoint, code, time.perf_counter() - start)
+
+    def read_body(self):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise RequestError(411, "Content-Length is required")
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        # The body is not read in either case, so the connection cannot be reused
+        if length < 0:
+            self.close_connection = True
+            raise RequestError(400, f"invalid Content-Length {self.headers.get('Content-Length')!r}")
+        if length > self.service.max_body_bytes:
+            self.close_connection = True
+            raise RequestError(413, f"body is larger than {self.service.max_body_bytes} bytes")
+        try:
+            return self.rfile.read(length)
+        except socket.timeout:
+            self.close_connection = True
+            raise RequestError(408, f"body not received within {self.server.request_timeout} seconds")
+
+    def handle_documents(self, endpoint, body):
+        """Process the document(s) of a POST request and send the response."""
+        _, _, to_json = self.service.endpoints[endpoint]
+        if not self.headers.get("Content-Type", "").startswith("application/json"):
+            # A bare PDF; desensitized PDFs go back as they are
+            result, = self.service.process(endpoint, [body])
+            if endpoint == "/desensitize" and result.status == "ok":
+                return self.send(200, result.pdf, "application/pdf",
+                                 {'X-Pages-Kept': str(result.pages_kept), 'X-Marker-Page': str(result.marker_page),
+                                  'X-Marker-Method': str(result.method)})
+            data = to_json(result)
+            data.pop('pdf', None)
+            return self.send_json(200 if endpoint == "/extract" else 422, data)
+
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            raise RequestError(400, f"invalid JSON: {str(e)}")
+        if isinstance(request, dict) and 'documents' in request:
+            documents = request['documents']
+            if not isinstance(documents, list):
+                raise RequestError(400, "documents must be a list")
+            if len(documents) > self.service.max_batch:
+                raise RequestError(413, f"at most {self.service.max_batch} documents per request")
+            results = self.service.process(endpoint, [self.service.source(document) for document in documents])
+            return self.send_json(200, {'results': [to_json(result) for result in results]})
+        result, = self.service.process(endpoint, [self.service.source(request)])
+        return self.send_json(200, to_json(result))
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port, service, request_timeout=REQUEST_TIMEOUT):
+        super().__init__((HOST, port), RequestHandler)
+        self.service = service
+        self.request_timeout = request_timeout
+
+def serve(port=DEFAULT_PORT, workers=1, max_pending=64, max_batch=DEFAULT_BATCH_SIZE, max_body_mb=64,
+          allowed_dirs=None, strategies=None, threshold=0.7, normalizer="compact", streaming=False,
+          time_budget=None, page_timeout=None, eager_pages=False, cache_path=None,
+          cache_size_mb=DEFAULT_CACHE_SIZE_MB, low_memory=None, request_timeout=REQUEST_TIMEOUT):
+    """
+    Serve the extraction and desensitization endpoints on 127.0.0.1:port until interrupted.
+
+    The options of the extract and desensitize stages, low-memory mode
+    included, apply to every request (see extract_document and
+    desensitize_document). A connection that sends nothing for
+    request_timeout seconds is closed, with a 408 if it stalls in the middle
+    of a body.
+    """
+    extract = functools.partial(extract_document, streaming=streaming, strategies=strategies, threshold=threshold,
+                                normalizer=normalizer, time_budget=time_budget, page_timeout=page_timeout,
+                                cache_path=cache_path, cache_size_mb=cache_size_mb, low_memory=low_memory)
+    desensitize = functools.partial(desensitize_bytes, time_budget=time_budget, page_timeout=page_timeout,
+                                    eager_pages=eager_pages, cache_path=cache_path, cache_size_mb=cache_size_mb,
+                                    low_memory=low_memory)
+    service = Service(workers, max_pending, max_batch, int(max_body_mb * (1 << 20)), allowed_dirs or [os.getcwd()],
+                      extract, desensitize)
+    try:
+        with Server(port, service, request_timeout) as server:
+            print(f"Serving on http://{HOST}:{server.server_address[1]} with {workers} workers")
+            server.serve_forever()
+    finally:
+        service.close()
@@ -0,0 +1,46 @@
+"""
+Options of the HTTP service (see disclosure_cleanup.service).
+
+They live apart from the service so that building the command line parser
+does not import http.server.
+"""
+import os
+from disclosure_cleanup.api import DEFAULT_BATCH_SIZE
+from disclosure_cleanup.budget import add_budget_arguments
+from disclosure_cleanup.extraction import NORMALIZERS, STRATEGIES, parse_strategy_list
+from disclosure_cleanup.memory import add_memory_arguments
+from disclosure_cleanup.page_cache import add_cache_arguments
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Seconds a connection may send nothing before the service closes it
+REQUEST_TIMEOUT = 30
+
+def add_service_arguments(parser):
+    """Add the options of the HTTP service to an argparse parser."""
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on at {HOST}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--max-pending", type=int, default=64,
+                       help="Documents that may be queued or in progress before requests are turned away with 503")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_BATCH_SIZE, help="Documents allowed per request")
+    parser.add_argument("--max-body-mb", type=float, default=64, help="Largest request body accepted, in MB")
+    parser.add_argument("--request-timeout", type=float, default=REQUEST_TIMEOUT,
+                       help="Seconds a client may send nothing before its connection is closed (408 mid-body)")
+    parser.add_argument("--allowed-dir", action="append", dest="allowed_dirs", default=None,
+                       help="Directory that documents given by path must be in (repeatable; default: the current "
+                            "directory)")
+    parser.add_argument("--strategies", type=parse_strategy_list, default=None,
+                       help="Comma-separated boundary strategies to use, run cheapest-first "
+                            f"(available: {', '.join(STRATEGIES)}; default: all)")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Similarity threshold for the fuzzy strategies")
+    parser.add_argument("--normalizer", choices=list(NORMALIZERS), default="compact",
+                       help="Text normalization used for marker matching")
+    parser.add_argument("--streaming", action="store_true",
+                       help="Extract pages one at a time and stop reading once the section marker is found")
+    parser.add_argument("--eager-pages", action="store_true",
+                       help="Extract the text of every page up front when desensitizing")
+    add_budget_arguments(parser)
+    add_cache_arguments(parser)
+    add_memory_arguments(parser)
+    return parser
@@ -0,0 +1,383 @@
+"""
+Sharded runs of the single-pass pipeline, spread over several machines that share the data directory.
+
+The unit of work is a top-level entry of raw/ (an XX-T-XXX folder). The
+rows of each folder go to a part of their own,
+all_extracted_texts.parts/<folder>.parquet in the output directory, and the
+merge step combines the parts into all_extracted_texts.parquet. A part is
+replaced in one step, so a folder that is processed twice (e.g. after its
+lease ran out) still has its rows in the output once.
+
+The folders are divided between the nodes in one of two ways:
+
+- With `--shard i/N`, node i of N takes the folders whose names hash to i.
+  Every node works out the same split without talking to the others.
+- With `--queue PATH`, the nodes share a SQLite work queue on the shared
+  storage. A node leases a few folders at a time, extends the leases while
+  it works on them and marks them done. If a node dies, its leases run out
+  and another node takes the folders over. Nodes that finish early simply
+  lease more, so a slow node does not hold up the run.
+"""
+import os
+import time
+import socket
+import sqlite3
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+from disclosure_cleanup.manifest import CHECKPOINT_SECONDS, checkpoint_path, new_digest, open_manifest
+from disclosure_cleanup.metrics import RunReport
+from disclosure_cleanup.page_cache import DEFAULT_CACHE_SIZE_MB
+from disclosure_cleanup.parts import PARTS_DIR, entry_pdf_files, find_folders, part_path
+from disclosure_cleanup.pipeline import process_batch
+
+DEFAULT_LEASE_SIZE = 4
+DEFAULT_LEASE_SECONDS = 300
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    folder TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def parse_shard(value):
+    """argparse type for --shard: "i/N" -> (i, N), with shards numbered from 0."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, e.g. 0/4, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard {value} does not exist; shards run from 0/{count} to "
+                                         f"{count - 1}/{count}")
+    return index, count
+
+def shard_of(name, count):
+    """The shard a folder name belongs to; unlike hash(), the same in every process and on every machine."""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+def shard_path(path, label):
+    """path with label inserted before its extension (pipeline.json -> pipeline.<label>.json), or None."""
+    if path is None:
+        return None
+    root, ext = os.path.splitext(path)
+    return f"{root}.{label}{ext}"
+
+def folder_fingerprint(pdf_files):
+    """A hash of the paths, sizes and mtimes of a folder's PDFs, which changes when any of them does."""
+    digest = new_digest()
+    for pdf_path in sorted(pdf_files):
+        stat = os.stat(pdf_path)
+        digest.update(f"{pdf_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+class WorkQueue:
+    """
+    Lease-based queue of raw folders in a SQLite file that all nodes of a run share.
+
+    A folder is pending, leased (by `owner`, until `lease_expires`), done or
+    failed. Every change is made in an immediate transaction, so two nodes
+    never lease the same folder. The file uses SQLite's rollback journal
+    rather than WAL, which needs memory shared between the processes and so
+    does not work across machines.
+    """
+
+    def __init__(self, path, owner=None, max_attempts=3):
+        self.path = path
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Transactions are started explicitly, with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(QUEUE_SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def sync(self, fingerprints):
+        """
+        Bring the queue up to date with the folders in raw/, given as {folder: fingerprint}.
+
+        New folders are queued. Done and failed folders whose files changed
+        are queued again. Folders that are gone are dropped unless a node is
+        working on them. Returns the number of pending folders.
+        """
+        with self.transaction():
+            known = {folder: (fingerprint, state) for folder, fingerprint, state
+                     in self.conn.execute("SELECT folder, fingerprint, state FROM folders")}
+            for folder, fingerprint in fingerprints.items():
+                if folder not in known:
+                    self.conn.execute("INSERT INTO folders (folder, fingerprint, state) VALUES (?, ?, 'pending')",
+                                      (folder, fingerprint))
+                elif known[folder][0] != fingerprint and known[folder][1] != "leased":
+                    self.conn.execute("UPDATE folders SET fingerprint = ?, state = 'pending', attempts = 0 "
+                                      "WHERE folder = ?", (fingerprint, folder))
+            self.conn.executemany("DELETE FROM folders WHERE folder = ? AND state != 'leased'",
+                                  [(folder,) for folder in known if folder not in fingerprints])
+        return self.counts().get("pending", 0)
+
+    def lease(self, count, seconds):
+        """Lease up to count folders that are pending or whose lease ran out, for seconds. Returns them."""
+        now = time.time()
+        with self.transaction():
+            # A folder whose node died on it too often probably kills nodes; stop handing it out
+            self.conn.execute("UPDATE folders SET state = 'failed', owner = NULL, lease_expires = NULL "
+                              "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                              (now, self.max_attempts))
+            folders = [folder for folder, in self.conn.execute(
+                "SELECT folder FROM folders WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY folder LIMIT ?", (now, count))]
+            self.conn.executemany("UPDATE folders SET state = 'leased', owner = ?, lease_expires = ?, "
+                                  "attempts = attempts + 1 WHERE folder = ?",
+                                  [(self.owner, now + seconds, folder) for folder in folders])
+        return folders
+
+    def extend(self, folders, seconds):
+        """Renew this node's leases on folders for another `seconds`."""
+        with self.transaction():
+            self.conn.executemany("UPDATE folders SET lease_expires = ? "
+                                  "WHERE folder = ? AND owner = ? AND state = 'leased'",
+                                  [(time.time() + seconds, folder, self.owner) for folder in folders])
+
+    def complete(self, folders):
+        """Mark folders leased by this node as done."""
+        with self.transaction():
+            self.conn.executemany("UPDATE folders SET state = 'done', owner = NULL, lease_expires = NULL "
+                                  "WHERE folder = ? AND owner = ? AND state = 'leased'",
+                                  [(folder, self.owner) for folder in folders])
+
+    def release(self, folders):
+        """Give back folders leased by this node unfinished, to be leased again (or failed after max_attempts)."""
+        with self.transaction():
+            self.conn.executemany("UPDATE folders SET owner = NULL, lease_expires = NULL, "
+                                  "state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END "
+                                  "WHERE folder = ? AND owner = ? AND state = 'leased'",
+                                  [(self.max_attempts, folder, self.owner) for folder in folders])
+
+    def counts(self):
+        """{state: number of folders}"""
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM folders GROUP BY state"))
+
+    def close(self):
+        self.conn.close()
+
+@contextmanager
+def leases_kept(queue, folders, seconds):
+    """Renew the leases on folders in a background thread until the block exits."""
+    stopped = threading.Event()
+
+    def renew():
+        # SQLite connections cannot be shared between threads
+        renewer = WorkQueue(queue.path, queue.owner, queue.max_attempts)
+        try:
+            while not stopped.wait(seconds / 3):
+                try:
+                    renewer.extend(folders, seconds)
+                except sqlite3.Error as e:
+                    print(f"Error renewing leases: {str(e)}")
+        finally:
+            renewer.close()
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+def process_folders(folders, manifest, parts_dir, report, raw_dir, disclosure_dir, supplementary_dir,
+                    disclosure_text_dir, desensitized_dir, workers=1, link_mode="copy", row_group_size=500,
+                    strategies=None, time_budget=None, page_timeout=None, cache_path=None,
+                    cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", dedup=False, low_memory=None):
+    """Run the pipeline on the PDFs of folders ({folder: PDF files}) in one batch and write a part per folder."""
+    pdf_files = [pdf_path for files in folders.values() for pdf_path in files]
+    parts = {pdf_path: part_path(parts_dir, folder) for folder, files in folders.items() for pdf_path in files}
+    return process_batch(pdf_files, manifest, None, report, raw_dir, disclosure_dir, supplementary_dir,
+                         disclosure_text_dir, desensitized_dir, workers, link_mode, row_group_size, strategies,
+                         time_budget, page_timeout, cache_path, cache_size_mb, classify_by, dedup,
+                         part_of=parts.get, low_memory=low_memory)
+
+def run_shard(shard, raw_dir, disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir, output_dir,
+              workers=1, manifest_path=None, link_mode="copy", row_group_size=500, strategies=None, time_budget=None,
+              page_timeout=None, report_path=None, prometheus_path=None, cache_path=None,
+              cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", dedup=False, resume=False,
+              checkpoint_interval=CHECKPOINT_SECONDS, low_memory=None):
+    """
+    Run the single-pass pipeline on shard (i, N) of the raw folders, writing a part per folder.
+
+    The manifest, run report and Prometheus textfile get the shard in their
+    names (pipeline.json -> pipeline.shard-0-of-4.json), so the shards do not
+    overwrite each other's and a shard that is run again is incremental.
+    Without a manifest, the shard's checkpoint is named the same way.
+    """
+    index, count = shard
+    label = f"shard-{index}-of-{count}"
+    for directory in (disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir, output_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    all_folders = find_folders(raw_dir)
+    folders = {folder: files for folder, files in all_folders.items()
+               if shard_of(os.path.basename(folder), count) == index}
+    pdf_files = [pdf_path for files in folders.values() for pdf_path in files]
+    print(f"Shard {index}/{count}: {len(folders)} of {len(all_folders)} folders, {len(pdf_files)} PDF files")
+
+    manifest, is_checkpoint = open_manifest(shard_path(manifest_path, label),
+                                            checkpoint_path(output_dir, f"pipeline.{label}"), resume,
+                                            checkpoint_interval)
+    removed = manifest.remove_stale(pdf_files)
+    if removed:
+        print(f"Removed outputs of {len(removed)} deleted files")
+
+    with RunReport(shard_path(report_path, label), shard_path(prometheus_path, label)) as report:
+        rows = process_folders(folders, manifest, os.path.join(output_dir, PARTS_DIR), report, raw_dir,
+                               disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir, workers,
+                               link_mode, row_group_size, strategies, time_budget, page_timeout, cache_path,
+                               cache_size_mb, classify_by, dedup, low_memory)
+    if is_checkpoint:
+        manifest.discard()
+    return rows
+
+def run_queue_worker(queue_path, raw_dir, disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir,
+                     output_dir, workers=1, link_mode="copy", row_group_size=500, strategies=None, time_budget=None,
+                     page_timeout=None, report_path=None, prometheus_path=None, cache_path=None,
+                     cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", dedup=False,
+                     lease_size=DEFAULT_LEASE_SIZE, lease_seconds=DEFAULT_LEASE_SECONDS, low_memory=None):
+    """
+    Process raw folders leased from the work queue at queue_path until none are left.
+
+    The queue is first brought up to date with raw_dir, so new and changed
+    folders are queued and an unchanged folder that is done is not processed
+    again. lease_size folders are leased and processed at a time. While other
+    nodes still hold leases the worker waits, and takes over any lease that
+    runs out. The run report and Prometheus textfile get the worker's name
+    (<host>-<pid>) in their names.
+    """
+    for directory in (disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir, output_dir):
+        os.makedirs(directory, exist_ok=True)
+    parts_dir = os.path.join(output_dir, PARTS_DIR)
+
+    queue = WorkQueue(queue_path)
+    folders = find_folders(raw_dir)
+    pending = queue.sync({folder: folder_fingerprint(files) for folder, files in folders.items()})
+    print(f"Worker {queue.owner}: {pending} of {len(folders)} folders to process in {queue_path}")
+
+    rows = 0
+    try:
+        with RunReport(shard_path(report_path, queue.owner), shard_path(prometheus_path, queue.owner)) as report:
+            while True:
+                leased = queue.lease(lease_size, lease_seconds)
+                if not leased:
+                    counts = queue.counts()
+                    if not counts.get("pending") and not counts.get("leased"):
+                        break
+                    # Other nodes are still at work; one of their leases may yet run out
+                    time.sleep(min(lease_seconds / 3, 30))
+                    continue
+
+                print(f"\nLeased {', '.join(os.path.basename(folder) for folder in leased)}")
+                try:
+                    with leases_kept(queue, leased, lease_seconds):
+                        rows += process_folders({folder: entry_pdf_files(folder) for folder in leased}, None,
+                                                parts_dir, report, raw_dir, disclosure_dir, supplementary_dir,
+                                                disclosure_text_dir, desensitized_dir, workers, link_mode,
+                                                row_group_size, strategies, time_budget, page_timeout, cache_path,
+                                                cache_size_mb, classify_by, dedup, low_memory)
+                except Exception as e:
+                    print(f"Error processing {', '.join(leased)}: {str(e)}")
+                    queue.release(leased)
+                    continue
+                except BaseException:
+                    # Interrupted: hand the folders back now rather than when the lease runs out
+                    queue.release(leased)
+                    raise
+                queue.complete(leased)
+                if prometheus_path:
+                    report.write_prometheus()
+
+        counts = queue.counts()
+        print(f"\nQueue: {counts.get('done', 0)} folders done, {counts.get('failed', 0)} failed")
+    finally:
+        queue.close()
+    return rows
+
+def merge_parts(output_dir, raw_dir=None, row_group_size=500):
+    """
+    Combine the parts in all_extracted_texts.parts/ into all_extracted_texts.parquet in output_dir.
+
+    The parts are copied in folder order, one record batch at a time, so
+    memory use does not grow with the corpus. With raw_dir, parts of folders
+    that are no longer in raw_dir are left out. The output replaces the
+    previous file in one step. Returns (rows written, raw folders without a
+    part).
+    """
+    import pyarrow.parquet as pq
+    from disclosure_cleanup.parquet_writer import ParquetRowWriter
+
+    parts_dir = os.path.join(output_dir, PARTS_DIR)
+    parts = sorted(name for name in os.listdir(parts_dir) if name.endswith(".parquet") and not name.startswith("."))
+    missing = []
+    if raw_dir is not None:
+        expected = {os.path.basename(part_path(parts_dir, folder)): folder for folder in find_folders(raw_dir)}
+        missing = [folder for name, folder in expected.items() if name not in parts]
+        stale = [name for name in parts if name not in expected]
+        if stale:
+            print(f"Leaving out {len(stale)} parts of folders no longer in {raw_dir}")
+        parts = [name for name in parts if name in expected]
+
+    output_path = os.path.join(output_dir, "all_extracted_texts.parquet")
+    tmp_path = os.path.join(output_dir, ".all_extracted_texts.parquet.tmp")
+    try:
+        with ParquetRowWriter(tmp_path, row_group_size=row_group_size) as writer:
+            for name in parts:
+                for batch in pq.ParquetFile(os.path.join(parts_dir, name)).iter_batches(batch_size=row_group_size):
+                    for row in batch.to_pylist():
+                        writer.write(row)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    print(f"Merged {len(parts)} parts ({writer.rows_written} rows) into {output_path}")
+    if missing:
+        print(f"{len(missing)} folders have no part yet: {', '.join(os.path.basename(f) for f in missing[:10])}"
+              + (", ..." if len(missing) > 10 else ""))
+    return writer.rows_written, missing
+
+def add_shard_arguments(parser):
+    """Add the options of sharded pipeline runs to an argparse parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                       help="Only process shard i (from 0) of N of the raw folders, writing a part per folder to "
+                            f"{PARTS_DIR}/; combine the parts with the merge command")
+    group.add_argument("--queue", default=None, metavar="PATH",
+                       help="Lease raw folders from this SQLite work queue (on storage all nodes share) until none "
+                            f"are left, writing a part per folder to {PARTS_DIR}/")
+    parser.add_argument("--lease-size", type=int, default=DEFAULT_LEASE_SIZE,
+                       help="Number of folders leased from the queue at a time")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                       help="How long a lease lasts without being renewed; a node renews its leases while it works")
+    return parser
+
+def add_merge_arguments(parser):
+    """Add the options of the merge step to an argparse parser."""
+    parser.add_argument("--output-dir", default="data", help=f"Directory containing {PARTS_DIR}/")
+    parser.add_argument("--raw-dir", default=None,
+                       help="Only merge the parts of folders in this directory, and report folders without a part")
+    parser.add_argument("--row-group-size", type=int, default=500,
+                       help="Number of documents per parquet row group")
+    return parser
@@ -0,0 +1,75 @@
+"""
+PDF inputs given as a path, in-memory bytes or a binary file-like object.
+"""
+import io
+import os
+from contextlib import contextmanager
+from disclosure_cleanup.manifest import content_hash, new_digest
+from disclosure_cleanup.memory import mapped_content
+
+def is_path(source):
+    """Check whether a PDF source is a filesystem path."""
+    return isinstance(source, (str, os.PathLike))
+
+def source_name(source):
+    """A name for a PDF source: its path, the name of a file object, or None for raw bytes."""
+    if is_path(source):
+        return str(source)
+    name = getattr(source, "name", None)
+    return name if isinstance(name, str) else None
+
+def materialize(source):
+    """
+    Turn a source into something that can be sent to a worker process.
+
+    Paths and bytes are returned as they are; file-like objects are read
+    into bytes, from the start if they are seekable (as PdfReader would).
+    """
+    if is_path(source) or isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    if source.seekable():
+        source.seek(0)
+    return source.read()
+
+@contextmanager
+def open_source(source, mapped=False):
+    """
+    Open a PDF source for reading and yield a seekable binary file.
+
+    Files opened here are closed afterwards; file-like objects passed in are
+    left open for the caller, and non-seekable ones are read into memory.
+    With mapped, a path is read through a memory map (see mapped_content).
+    """
+    if is_path(source) and mapped:
+        with mapped_content(source) as content:
+            yield content if content else io.BytesIO(content)
+    elif is_path(source):
+        with open(source, 'rb') as file:
+            yield file
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif source.seekable():
+        yield source
+    else:
+        yield io.BytesIO(source.read())
+
+def file_size(file):
+    """Size in bytes of an open, seekable file, leaving its position unchanged."""
+    position = file.tell()
+    size = file.seek(0, io.SEEK_END)
+    file.seek(position)
+    return size
+
+def source_hash(source, file, chunk_size=1 << 20):
+    """Content hash of a PDF source, hashed the same way as content_hash hashes files."""
+    if is_path(source):
+        return content_hash(source)
+    digest = new_digest()
+    position = file.tell()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(position)
+    return digest.hexdigest()
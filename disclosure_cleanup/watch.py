@@ -0,0 +1,261 @@
+"""
+Watch mode: run the single-pass pipeline on new disclosure folders as they land in raw/.
+
+The raw directory is watched with inotify (called through ctypes, so only
+on Linux) or, where that is not available, by polling the sizes and mtimes
+of the files in it. Each top-level entry of raw/ (an XX-T-XXX folder) is
+handled as a unit once nothing in it has changed for `settle` seconds, so a
+folder that is still being copied is not picked up half-written. Its PDFs
+then go through process_batch with a bounded worker pool: the files are
+classified, extracted and desensitized into the usual directories, and the
+rows replace the folder's part in all_extracted_texts.parts/, the same
+parts sharded runs write (see disclosure_cleanup.parts).
+"""
+import os
+import sys
+import time
+import select
+import struct
+from disclosure_cleanup.manifest import Manifest
+from disclosure_cleanup.metrics import RunReport
+from disclosure_cleanup.page_cache import DEFAULT_CACHE_SIZE_MB
+from disclosure_cleanup.parts import PARTS_DIR, entry_pdf_files, part_path, top_level_entry
+from disclosure_cleanup.pipeline import add_pipeline_arguments, process_batch
+from disclosure_cleanup.selection import find_pdf_files
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event without its variable-length name
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """Report which top-level entries of a directory tree changed, using inotify."""
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+
+        self.ctypes = ctypes
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.root = root
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.directories = {}
+        self.add_tree(root)
+
+    def add_tree(self, directory):
+        """Watch directory and every directory below it."""
+        for dirpath, _, _ in os.walk(directory):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                errno = self.ctypes.get_errno()
+                if dirpath == self.root:
+                    raise OSError(errno, os.strerror(errno), dirpath)
+                # Removed again already, or out of watches; the folder's own events still arrive
+                print(f"Error watching {dirpath}: {os.strerror(errno)}")
+                continue
+            self.directories[wd] = dirpath
+
+    def changes(self, timeout):
+        """Wait up to timeout seconds for events and return the set of top-level entries that changed."""
+        changed = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                offset += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: treat everything as changed
+                    changed.update(entry.path for entry in os.scandir(self.root))
+                    continue
+                if mask & IN_IGNORED:
+                    self.directories.pop(wd, None)
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                entry = top_level_entry(self.root, path)
+                if entry is not None:
+                    changed.add(entry)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Report which top-level entries of a directory tree changed by comparing snapshots of it."""
+
+    def __init__(self, root):
+        self.root = root
+        self.snapshot = self.scan()
+
+    def scan(self):
+        """{top-level entry: set of (path, size, mtime) of the files in it}"""
+        snapshot = {}
+        for entry in os.scandir(self.root):
+            if entry.is_dir():
+                paths = [os.path.join(dirpath, filename) for dirpath, _, filenames in os.walk(entry.path)
+                         for filename in filenames]
+            else:
+                paths = [entry.path]
+            files = set()
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.add((path, stat.st_size, stat.st_mtime_ns))
+            snapshot[entry.path] = files
+        return snapshot
+
+    def changes(self, timeout):
+        """Sleep for timeout seconds and return the set of top-level entries that changed meanwhile."""
+        time.sleep(timeout)
+        snapshot = self.scan()
+        changed = {entry for entry in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(entry) != self.snapshot.get(entry)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+def open_watcher(root, polling=False):
+    """Watch root with inotify where possible, else by polling."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify is not available ({str(e)}), polling instead")
+    return PollingWatcher(root)
+
+def process_folder(folder, manifest, parts_dir, report, raw_dir, disclosure_dir, supplementary_dir,
+                   disclosure_text_dir, desensitized_dir, workers=1, link_mode="copy", row_group_size=500,
+                   strategies=None, time_budget=None, page_timeout=None, cache_path=None,
+                   cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", dedup=False, low_memory=None):
+    """
+    Run the pipeline on the PDFs of one top-level entry of raw_dir and replace its part of the dataset.
+
+    The part holds the rows of every PDF the entry has now (with a manifest,
+    unchanged files' rows are rebuilt from their text outputs), so rows of
+    changed or deleted files never linger. It is removed once the entry has
+    no rows left.
+    """
+    pdf_files = entry_pdf_files(folder)
+    if manifest is not None:
+        removed = manifest.remove_stale(pdf_files, folder)
+        if removed:
+            print(f"Removed outputs of {len(removed)} files deleted from {folder}")
+            manifest.save()
+    part = part_path(parts_dir, folder)
+    name = os.path.basename(folder)
+    if not pdf_files:
+        if os.path.exists(part):
+            os.remove(part)
+            print(f"Removed the part of {name}")
+        return 0
+
+    print(f"\nProcessing {name}: {len(pdf_files)} PDF files")
+    # Readers of the dataset skip hidden files, and the rename replaces the old part in one step
+    tmp_path = os.path.join(parts_dir, f".{os.path.basename(part)}.tmp")
+    try:
+        rows = process_batch(pdf_files, manifest, tmp_path, report, raw_dir, disclosure_dir, supplementary_dir,
+                             disclosure_text_dir, desensitized_dir, workers, link_mode, row_group_size, strategies,
+                             time_budget, page_timeout, cache_path, cache_size_mb, classify_by, dedup,
+                             include_unchanged=True, low_memory=low_memory)
+        if rows:
+            os.replace(tmp_path, part)
+        elif os.path.exists(part):
+            os.remove(part)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+def watch_pipeline(raw_dir, disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir, output_dir,
+                   workers=1, manifest_path=None, link_mode="copy", row_group_size=500, strategies=None,
+                   time_budget=None, page_timeout=None, report_path=None, prometheus_path=None, cache_path=None,
+                   cache_size_mb=DEFAULT_CACHE_SIZE_MB, classify_by="content", dedup=False, settle=10.0, poll_interval=5.0,
+                   polling=False, low_memory=None):
+    """
+    Run the single-pass pipeline on every folder of raw_dir that is created or changed, until interrupted.
+
+    A folder is processed once nothing in it has changed for `settle`
+    seconds. With a manifest, only its new and changed PDFs are processed,
+    folders that already had unprocessed PDFs at startup are processed too,
+    and the outputs of PDFs removed from a folder are deleted. Each folder
+    has one part, <folder>.parquet, in all_extracted_texts.parts/ in
+    output_dir, which is replaced whenever the folder is processed. Run totals go to the
+    Prometheus textfile after every batch.
+    """
+    for directory in (disclosure_dir, supplementary_dir, disclosure_text_dir, desensitized_dir, output_dir):
+        os.makedirs(directory, exist_ok=True)
+    parts_dir = os.path.join(output_dir, PARTS_DIR)
+    os.makedirs(parts_dir, exist_ok=True)
+    manifest = Manifest(manifest_path) if manifest_path else None
+
+    watcher = open_watcher(raw_dir, polling)
+    print(f"Watching {raw_dir} ({type(watcher).__name__}); press Ctrl-C to stop")
+
+    # Folders waiting to settle, with the time they last changed
+    last_changed = {}
+    if manifest is not None:
+        for pdf_path in find_pdf_files(raw_dir):
+            if not manifest.is_current(pdf_path):
+                last_changed[top_level_entry(raw_dir, pdf_path)] = time.monotonic()
+
+    report = RunReport(report_path, prometheus_path)
+    try:
+        while True:
+            now = time.monotonic()
+            timeout = min([changed + settle - now for changed in last_changed.values()] + [poll_interval])
+            for entry in watcher.changes(max(timeout, 0)):
+                last_changed[entry] = time.monotonic()
+
+            now = time.monotonic()
+            for entry in sorted(entry for entry, changed in last_changed.items() if now - changed >= settle):
+                del last_changed[entry]
+                try:
+                    process_folder(entry, manifest, parts_dir, report, raw_dir, disclosure_dir, supplementary_dir,
+                                   disclosure_text_dir, desensitized_dir, workers, link_mode, row_group_size,
+                                   strategies, time_budget, page_timeout, cache_path, cache_size_mb, classify_by,
+                                   dedup, low_memory)
+                except Exception as e:
+                    print(f"Error processing {entry}: {str(e)}")
+                if prometheus_path:
+                    report.write_prometheus()
+    finally:
+        watcher.close()
+        report.close()
+
+def add_watch_arguments(parser):
+    """Add the options of watch mode (those of the pipeline and a few more) to an argparse parser."""
+    add_pipeline_arguments(parser)
+    parser.add_argument("--settle", type=float, default=10.0,
+                       help="Seconds a folder must go unchanged before it is processed")
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                       help="Seconds between scans when polling (and the longest wait between checks)")
+    parser.add_argument("--polling", action="store_true", help="Poll the raw directory even if inotify is available")
+    return parser
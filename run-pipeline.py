@@ -0,0 +1,27 @@
+import sys
+import signal
+import argparse
+from disclosure_cleanup.cli import run_command
+from disclosure_cleanup.manifest import add_checkpoint_arguments
+from disclosure_cleanup.pipeline import add_pipeline_arguments
+from disclosure_cleanup.sharding import add_shard_arguments
+
+# Handle broken pipe errors in Python
+signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Classify, extract and desensitize disclosure forms in a single pass")
+    add_pipeline_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_shard_arguments(parser)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    # Turn SIGTERM (e.g. preemption) into SystemExit so the parquet footer is still written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    # Parse command line arguments
+    args = parse_args()
+
+    sys.exit(run_command(args))
@@ -6,15 +6,24 @@ BASE_DIR="data"
 DISCLOSURE_DIR="data/invention_disclosure"
 DISCLOSURE_TEXT_DIR="data/invention_disclosure_text"
 SUPPLEMENTARY_DIR="data/supplementary_information"
+DESENSITIZED_DIR="data/desensitized"
+MANIFEST_DIR="data/.manifests"
+PAGE_CACHE="data/.cache/page_text.sqlite"
 
-pip install -r requirements.txt
+# Only install the requirements when they changed since the last install
+REQUIREMENTS_STAMP="$BASE_DIR/.requirements-installed"
+if [ ! -f "$REQUIREMENTS_STAMP" ] || [ requirements.txt -nt "$REQUIREMENTS_STAMP" ]; then
+    pip install -r requirements.txt && mkdir -p "$BASE_DIR" && touch "$REQUIREMENTS_STAMP"
+fi
 
-python 00-select-disclosure.py \
+# Classify, extract and desensitize in a single interpreter and a single pass
+python -m disclosure_cleanup run \
     --raw-dir "$RAW_DIR" \
     --disclosure-dir "$DISCLOSURE_DIR" \
-    --supplementary-dir "$SUPPLEMENTARY_DIR"
-
-python 01-extract-content.py \
-    --disclosure-dir "$DISCLOSURE_DIR" \
+    --supplementary-dir "$SUPPLEMENTARY_DIR" \
     --disclosure-text-dir "$DISCLOSURE_TEXT_DIR" \
-    --output-dir "$BASE_DIR"
\ No newline at end of file
+    --desensitized-dir "$DESENSITIZED_DIR" \
+    --output-dir "$BASE_DIR" \
+    --manifest "$MANIFEST_DIR/pipeline.json" \
+    --page-cache "$PAGE_CACHE" \
+    --dedup